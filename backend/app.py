@@ -1,196 +1,489 @@
-import os
-import glob
+import asyncio
+import hashlib
 import json
-from fastapi import FastAPI, File, Form, UploadFile
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from dotenv import load_dotenv
-import tiktoken
-from openai import OpenAI
-from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
-import PyPDF2
-import io
-#import docx
-
-# — Initialization —
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-QDRANT_URL      = os.getenv("QDRANT_URL", "http://localhost:6333")
-EMBED_MODEL     = "text-embedding-ada-002"
-COLLECTION_NAME = "linkedin_profiles"
-MAX_TOKENS      = 2048
-
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-qdrant = QdrantClient(url=QDRANT_URL)
-encoding = tiktoken.encoding_for_model(EMBED_MODEL)
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from config import (
+    BATCH_EMAIL_CONCURRENCY,
+    BATCH_EMAIL_MAX,
+    CHAT_RATE_LIMIT_RPM,
+    CHAT_TIMEOUT,
+    COLLECTION_NAME,
+    EMBED_CACHE_MODEL,
+    EMBED_CACHE_PATH,
+    EMBED_DIMENSIONS,
+    EMBED_MODEL,
+    EXTRACT_CACHE_SIZE,
+    EXTRACT_CACHE_TTL,
+    EXTRACT_WORKERS,
+    FILE_CONTEXT_TOKENS,
+    FILTER_FACET_LIMIT,
+    FILTER_FIELDS,
+    HYBRID_SEARCH,
+    INGEST_ON_STARTUP,
+    INGEST_STATUS_PATH,
+    LEXICAL_FAST_PATH,
+    MAX_UPLOAD_BYTES,
+    PROFILER_ENABLED,
+    QUERY_BATCH_MAX,
+    QUERY_BATCH_WINDOW_MS,
+    QUERY_CACHE_PERSIST,
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_TTL,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL,
+    RRF_K,
+    SEARCH_MAX_DEPTH,
+    SEARCH_MAX_K,
+    SIMILAR_K,
+    SIMILAR_PATH,
+    async_openai_client,
+    async_qdrant,
+    encoding,
+    metrics,
+    store,
+)
+from documents import extract_text, trim_to_tokens
+from embed_cache import EmbeddingCache
+from embedding_pipeline import QueryCoalescer
+from lexical_index import LexicalIndex, rrf
+from metrics import SamplingProfiler
+from progress import IngestProgress, read_index_version
+from query_cache import TTLCache, normalize_query
+from rate_limit import RateLimiter
+from similar_profiles import SimilarityGraph
+
+index_ready = False  # True once the alias points at a non-empty collection that search can serve
+query_vectors = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+query_vectors_disk = EmbeddingCache(EMBED_CACHE_PATH, EMBED_CACHE_MODEL) if QUERY_CACHE_PERSIST else None
+search_results = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+search_results.version = None
+query_coalescer = QueryCoalescer(async_openai_client, EMBED_MODEL, QUERY_BATCH_WINDOW_MS, QUERY_BATCH_MAX,
+                                 dimensions=EMBED_DIMENSIONS, metrics=metrics)
+lexical = LexicalIndex()
+chat_rate_limit = RateLimiter(CHAT_RATE_LIMIT_RPM)
+extracted_files = TTLCache(EXTRACT_CACHE_SIZE, EXTRACT_CACHE_TTL)
+# spawn, not fork: the API process has an event loop and client threads running
+extract_pool = ProcessPoolExecutor(EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+lexical_sync_task = None
+profiler = SamplingProfiler()
+similar = SimilarityGraph(SIMILAR_PATH, SIMILAR_K)  # loaded lazily, reloaded when ingest rewrites it
 
 app = FastAPI()
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    if not metrics.enabled:
+        return await call_next(request)
+    start = time.perf_counter()
+    response = await call_next(request)
+    # The route template, so /api/profiles/123 and /api/profiles/456 share one series
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.observe("bearlink_http_request_seconds", time.perf_counter() - start, route=route)
+    metrics.inc("bearlink_http_requests_total", route=route, status=response.status_code)
+    return response
+
 # — Data models —
 class SearchRequest(BaseModel):
     query: str
+    k: int = Field(10, ge=1, le=SEARCH_MAX_K)  # unique profiles per page
+    cursor: Optional[str] = None               # next_cursor from the previous page
+    # Optional filters; past_companies matches profiles that worked at any of them
+    current_company: Optional[str] = None
+    past_companies: List[str] = []
+    location: Optional[str] = None
+    school: Optional[str] = None
+
+    def filters(self):
+        """{payload field: [accepted values]} for the store."""
+        filters = {
+            "current_company": [self.current_company] if self.current_company else [],
+            "experience_companies": self.past_companies,
+            "location": [self.location] if self.location else [],
+            "schools": [self.school] if self.school else [],
+        }
+        return {field: values for field, values in filters.items() if values}
 
 class EmailRequest(BaseModel):
     profile: dict
     context: str
 
-# — Utilities —
-def chunk_by_tokens(text):
-    ids = encoding.encode(text)
-    for i in range(0, len(ids), MAX_TOKENS):
-        yield encoding.decode(ids[i:i+MAX_TOKENS])
-
-def profile_to_text(profile):
-    parts = [f"{profile.get('name','')} — {profile.get('position','')}"]
-    if about:=profile.get("about"): parts.append(about)
-    curr = (profile.get("current_company") or {}).get("name")
-    if curr: parts.append(f"Current: {curr}")
-    exp = profile.get("experience") or []
-    ent = [f"{e['title']} at {e['company']}" for e in exp if e.get("title") and e.get("company")]
-    if ent: parts.append("Experience: " + "; ".join(ent))
-    return "\n\n".join(parts)
-
-# — On startup: ingest JSON -> Qdrant —
+# — Readiness —
+async def check_index_ready():
+    """Search can be served as soon as the alias resolves to a collection with points in it."""
+    global index_ready
+    if not index_ready:
+        try:
+            index_ready = await store.acount(COLLECTION_NAME, exact=False) > 0
+        except Exception as e:
+            print(f"Index not available yet: {e}")
+    return index_ready
+
+async def cancel_on_disconnect(request, coro, poll=0.5):
+    """Run coro, cancelling it (and its upstream HTTP call) if the client goes away first."""
+    task = asyncio.ensure_future(coro)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=poll)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            raise HTTPException(status_code=499, detail="Client disconnected")
+
+# — On startup: attach to the alias; ingestion runs separately via ingest.py —
 @app.on_event("startup")
-def startup_event():
-    profiles = []
-    json_files = glob.glob("../linkedin_profiles_prod/linkedin_profiles_raw_*.json")
-    print(f"Found {len(json_files)} JSON files to process")
-    
-    for path in json_files:
-        print(f"Processing file: {path}")
-        with open(path) as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                profiles.extend(data)
-    
-    print(f"Found {len(profiles)} profiles to embed")
+async def startup_event():
+    if INGEST_ON_STARTUP:
+        from ingest import run_ingest
+        app.state.ingest_task = asyncio.create_task(run_ingest())
+    if await check_index_ready():
+        schedule_lexical_sync(read_index_version(INGEST_STATUS_PATH))
 
-    qdrant.recreate_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config={"size": 1536, "distance": "Cosine"},
-    )
+@app.on_event("shutdown")
+async def shutdown_event():
+    await async_openai_client.close()
+    if async_qdrant is not None:
+        await async_qdrant.close()
+    extract_pool.shutdown(cancel_futures=True)
+
+@app.get("/api/ready")
+async def ready():
+    ingest_state = IngestProgress.load(INGEST_STATUS_PATH)["state"]
+    if not await check_index_ready():
+        return JSONResponse({"ready": False, "ingest": ingest_state}, status_code=503)
+    return {"ready": True, "ingest": ingest_state}
+
+@app.get("/api/ingest/status")
+def ingest_status():
+    return IngestProgress.load(INGEST_STATUS_PATH)
+
+# — Query caches —
+async def embed_query(query):
+    """Query vector from the in-memory LRU, then the on-disk cache, then a coalesced OpenAI call."""
+    key = normalize_query(query)
+    qvec = query_vectors.get(key)
+    if qvec is None and query_vectors_disk is not None:
+        qvec = (await asyncio.to_thread(query_vectors_disk.get_many, [key])).get(key)
+    if qvec is None:
+        with metrics.span("query_embed"):
+            qvec = await query_coalescer.embed(key)
+        if query_vectors_disk is not None:
+            await asyncio.to_thread(query_vectors_disk.put_many, [(key, qvec)])
+    query_vectors.set(key, qvec)
+    return qvec
 
-    idx = 0
-    points = []
-    for p in profiles:
-        if not p.get("id"): 
-            print(f"Skipping profile without ID: {p.get('name', 'Unknown')}")
-            continue
-        txt = profile_to_text(p)
-        for chunk_i, piece in enumerate(chunk_by_tokens(txt)):
-            emb = openai_client.embeddings.create(model=EMBED_MODEL, input=piece).data[0].embedding
-            payload = {
-                "profile_id": p["id"],
-                "current_company": (p.get("current_company") or {}).get("name"),
-                "experience_companies": [e.get("company") for e in (p.get("experience") or []) if e.get("company")],
-                "text": piece,
-                "url": p.get("url"),
-            }
-            points.append(PointStruct(id=idx, vector=emb, payload=payload))
-            idx += 1
-            if len(points) >= 100:
-                qdrant.upsert(collection_name=COLLECTION_NAME, points=points)
-                points = []
-                print(f"Processed {idx} chunks so far")
-    if points:
-        qdrant.upsert(collection_name=COLLECTION_NAME, points=points)
-        print(f"Final batch: processed {idx} chunks total")
+# — Lexical index: kept in step with the index version in the background —
+def schedule_lexical_sync(version):
+    global lexical_sync_task
+    if not HYBRID_SEARCH or (lexical.synced and lexical.version == version):
+        return
+    if lexical_sync_task is None or lexical_sync_task.done():
+        lexical_sync_task = asyncio.create_task(sync_lexical(version))
+
+async def sync_lexical(version):
+    try:
+        changed, removed = await asyncio.to_thread(lexical.sync, store.payloads(COLLECTION_NAME), version)
+        print(f"Lexical index: {changed} profiles added or changed, {removed} removed, {len(lexical)} total")
+    except Exception as e:
+        print(f"Lexical index sync failed: {e}")
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {
+        "query_vectors": query_vectors.stats(),
+        "search_results": search_results.stats(),
+        "index_version": read_index_version(INGEST_STATUS_PATH),
+        "query_batching": query_coalescer.stats(),
+        "lexical_index": lexical.stats(),
+        "extracted_files": extracted_files.stats(),
+        "similar_profiles": similar.stats(),
+    }
 
 @app.post("/api/search")
-def search(req: SearchRequest):
+async def search(req: SearchRequest):
+    if not await check_index_ready():
+        raise HTTPException(status_code=503, detail="Index is still being built")
     print(f"User query: {req.query}")
-    qvec = openai_client.embeddings.create(model=EMBED_MODEL, input=req.query).data[0].embedding
-    hits = qdrant.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=qvec,
-        limit=10,
-        with_payload=True
-    )
-    print(f"Search returned {len(hits)} results")
-    
-    # Use a dictionary to deduplicate results by profile_id
-    results_dict = {}
-    for h in hits:
-        p = h.payload
-        profile_id = p.get("profile_id")
-        if profile_id not in results_dict:  # Only add if we haven't seen this profile before
-            text = p.get("text", "")
-            lines = text.split("\\n\\n")
-            if len(lines) > 0 and "—" in lines[0]:
-                name, title = lines[0].split("—", 1)
-            else:
-                name, title = "Unknown", "Unknown"
-            results_dict[profile_id] = {
-                "name": name.strip(),
-                "title": title.strip(),
-                "bio": text,
-                "profile_id": profile_id,
-                "current_company": p.get("current_company"),
-                "experience_companies": p.get("experience_companies"),
-                "url": p.get("url"),
-            }
-    
-    # Convert dictionary values back to list
-    results = list(results_dict.values())
-    return results
+    # Tagged with the index version, so anything cached before an ingest changed the index is never hit
+    version = read_index_version(INGEST_STATUS_PATH)
+    if version != search_results.version:
+        search_results.clear()
+        search_results.version = version
+    schedule_lexical_sync(version)
+    try:
+        offset = int(req.cursor or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    depth = offset + req.k
+    if offset < 0 or depth > SEARCH_MAX_DEPTH:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # The ranked profile list is cached per query and only re-fetched when a page goes deeper than it
+    filters = req.filters()
+    result_key = (version, normalize_query(req.query), tuple((f, tuple(sorted(v))) for f, v in sorted(filters.items())))
+    cached = search_results.get(result_key)
+    if cached is None or (len(cached[0]) < depth and not cached[1]):
+        ranked, exhausted = await hybrid_search(req.query, depth, filters)
+        if cached is not None:
+            # Keep the pages already served in place; a deeper fetch only appends
+            served = {r["profile_id"] for r in cached[0]}
+            ranked = cached[0] + [r for r in ranked if r["profile_id"] not in served]
+        cached = (ranked, exhausted)
+        search_results.set(result_key, cached)
+    ranked, exhausted = cached
+    results = ranked[offset:depth]
+    more = len(ranked) > depth or not exhausted
+    return {"results": results, "next_cursor": str(depth) if more and len(results) == req.k else None}
+
+async def hybrid_search(query, depth, filters):
+    """Top `depth` profiles by reciprocal rank fusion of the vector and BM25 rankings.
+
+    Queries that are exactly a known company, school or location name (or quoted) are answered
+    from the lexical index alone, without an embedding call. Returns (results, exhausted).
+    """
+    lexical_hits = []
+    use_lexical = HYBRID_SEARCH and lexical.synced
+    if use_lexical:
+        with metrics.span("lexical_search"):
+            lexical_hits = await asyncio.to_thread(lexical.search, query, depth, filters)
+    if use_lexical and LEXICAL_FAST_PATH and lexical_hits and lexical.is_exact(query):
+        print(f"Lexical search returned {len(lexical_hits)} profiles")
+        with metrics.span("result_assembly"):
+            return [profile_result(p) for _, _, p in lexical_hits], len(lexical_hits) < depth
+    qvec = await embed_query(query)
+    with metrics.span("vector_search"):
+        hits = await store.asearch_groups(COLLECTION_NAME, qvec, depth, "profile_id", filters)
+    print(f"Search returned {len(hits)} profiles, {len(lexical_hits)} lexical")
+    with metrics.span("result_assembly"):
+        payloads = {pid: p for pid, _, p in lexical_hits}
+        payloads.update((h.payload["profile_id"], h.payload) for h in hits)
+        fused = rrf([h.payload["profile_id"] for h in hits], [pid for pid, _, _ in lexical_hits], k=RRF_K)
+        return [profile_result(payloads[pid]) for pid in fused], len(hits) < depth and len(lexical_hits) < depth
+
+def profile_result(p):
+    text = p.get("text", "")
+    lines = text.split("\\n\\n")
+    if len(lines) > 0 and "—" in lines[0]:
+        name, title = lines[0].split("—", 1)
+    else:
+        name, title = "Unknown", "Unknown"
+    return {
+        "name": name.strip(),
+        "title": title.strip(),
+        "bio": text,
+        "profile_id": p.get("profile_id"),
+        "current_company": p.get("current_company"),
+        "experience_companies": p.get("experience_companies"),
+        "location": p.get("location"),
+        "schools": p.get("schools"),
+        "url": p.get("url"),
+    }
+
+@app.get("/api/profiles/{profile_id}/similar")
+async def similar_profiles(profile_id: str, limit: int = Query(min(10, SIMILAR_K), ge=1, le=SIMILAR_K)):
+    """Nearest profiles from the graph ingest precomputes: a dictionary read, no embedding or vector search."""
+    await asyncio.to_thread(similar.reload_if_changed)
+    with metrics.span("similar_lookup"):
+        neighbors = similar.neighbors(profile_id, limit)
+        if neighbors is None:
+            raise HTTPException(status_code=404, detail="Unknown profile, or the similarity graph isn't built yet")
+        return {"results": [{**profile_result(similar.cards[pid]), "score": score} for pid, score in neighbors]}
+
+@app.get("/api/filters")
+async def search_filters():
+    """The most common values of each filterable field, for the UI's selectors."""
+    if not await check_index_ready():
+        raise HTTPException(status_code=503, detail="Index is still being built")
+    values = await asyncio.gather(*[store.afacets(COLLECTION_NAME, f, FILTER_FACET_LIMIT) for f in FILTER_FIELDS])
+    return dict(zip(FILTER_FIELDS, values))
 
 # — Endpoint: email generation —
 async def extract_text_from_file(file: UploadFile) -> str:
-    content = await file.read()
+    """Upload text trimmed to FILE_CONTEXT_TOKENS, parsed off the event loop and cached by content hash."""
+    content = await file.read(MAX_UPLOAD_BYTES + 1)
+    if len(content) > MAX_UPLOAD_BYTES:
+        limit = f"{MAX_UPLOAD_BYTES / 2**20:.1f} MB" if MAX_UPLOAD_BYTES >= 2**20 else f"{MAX_UPLOAD_BYTES:,} bytes"
+        raise ValueError(f"File is larger than {limit}")
     file_extension = file.filename.split('.')[-1].lower()
-    
-    if file_extension == 'pdf':
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    elif file_extension == 'txt':
-        return content.decode('utf-8')
-    elif file_extension == 'docx':
-        doc = docx.Document(io.BytesIO(content))
-        text = "\n".join([para.text for para in doc.paragraphs])
-        return text
-    else:
-        raise ValueError(f"Unsupported file type: {file_extension}")
+    key = (hashlib.sha256(content).hexdigest(), file_extension)
+    text = extracted_files.get(key)
+    if text is None:
+        with metrics.span("file_extraction"):
+            text = await asyncio.get_running_loop().run_in_executor(extract_pool, extract_text, content, file_extension)
+            text = await asyncio.to_thread(trim_to_tokens, text, encoding, FILE_CONTEXT_TOKENS)
+        extracted_files.set(key, text)
+    return text
+
+async def file_context(file):
+    if not file:
+        return ""
+    return f"\nAdditional context from uploaded file:\n{await extract_text_from_file(file)}"
+
+def email_prompt(profile_dict, context, file_context):
+    return (
+        f"Write a friendly, concise LinkedIn message to {profile_dict.get('profile_id', 'someone')} "
+        f"({profile_dict.get('current_company', 'their current company')}).\n"
+        f"You want to connect because {context}."
+        f"{file_context}"
+    )
+
+async def build_email_prompt(profile, context, file):
+    return email_prompt(json.loads(profile), context, await file_context(file))
 
 @app.post("/api/email")
 async def email(
+    request: Request,
     profile: str = Form(...),
     context: str = Form(...),
     file: UploadFile = File(None)
 ):
-    profile_dict = json.loads(profile) 
-    file_context = ""
-    if file:
-        try:
-            file_context = await extract_text_from_file(file)
-            file_context = f"\nAdditional context from uploaded file:\n{file_context}"
-        except Exception as e:
-            return {"error": f"Error processing file: {str(e)}"}
+    try:
+        prompt = await build_email_prompt(profile, context, file)
+    except Exception as e:
+        return {"error": f"Error processing file: {str(e)}"}
     
-    prompt = (
-        f"Write a friendly, concise LinkedIn message to {profile_dict.get('profile_id', 'someone')} "
-        f"({profile_dict.get('current_company', 'their current company')}).\n"
-        f"You want to connect because {context}."
-        f"{file_context}"
-    )
-    
-    resp = openai_client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}]
-    )
+    with metrics.span("chat_completion"):
+        resp = await cancel_on_disconnect(request, async_openai_client.chat.completions.create(
+            model="gpt-4",
+            messages=[{"role": "user", "content": prompt}],
+            timeout=CHAT_TIMEOUT,
+        ))
+    metrics.tokens("gpt-4", resp.usage)
     return {"email": resp.choices[0].message.content}
 
+@app.post("/api/email/stream")
+async def email_stream(
+    profile: str = Form(...),
+    context: str = Form(...),
+    file: UploadFile = File(None)
+):
+    """Same as /api/email, but forwards completion deltas as NDJSON lines as soon as they arrive.
+
+    Lines are {"delta": "..."} followed by {"done": true}, or {"error": "..."}. Starlette cancels
+    the generator (and with it the upstream completion) if the client disconnects.
+    """
+    try:
+        prompt = await build_email_prompt(profile, context, file)
+        error = None
+    except Exception as e:
+        error = f"Error processing file: {str(e)}"
+
+    async def events():
+        if error:
+            yield json.dumps({"error": error}) + "\n"
+            return
+        try:
+            with metrics.span("chat_completion"):
+                stream = await async_openai_client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=True,
+                    stream_options={"include_usage": True},  # token counts arrive in a last, choice-less chunk
+                    timeout=CHAT_TIMEOUT,
+                )
+                async with stream:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            yield json.dumps({"delta": delta}) + "\n"
+                        metrics.tokens("gpt-4", chunk.usage)
+        except Exception as e:
+            yield json.dumps({"error": f"Error generating message: {str(e)}"}) + "\n"
+            return
+        yield json.dumps({"done": True}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/api/email/batch")
+async def email_batch(
+    profiles: str = Form(...),
+    context: str = Form(...),
+    file: UploadFile = File(None)
+):
+    """Messages to several profiles with one shared context and file, streamed as NDJSON as each finishes.
+
+    The file is parsed once. At most BATCH_EMAIL_CONCURRENCY completions run at a time (and no more
+    than CHAT_RATE_LIMIT_RPM start per minute across the worker). Lines are {"index", "profile_id",
+    "email"} or {"index", "profile_id", "error"} in completion order, then {"done": true}.
+    """
+    try:
+        profile_list = json.loads(profiles)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="profiles must be a JSON list")
+    if not isinstance(profile_list, list) or not profile_list or not all(isinstance(p, dict) for p in profile_list):
+        raise HTTPException(status_code=400, detail="profiles must be a non-empty JSON list of profiles")
+    if len(profile_list) > BATCH_EMAIL_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_EMAIL_MAX} profiles per batch")
+    try:
+        shared = await file_context(file)
+        error = None
+    except Exception as e:
+        error = f"Error processing file: {str(e)}"
+
+    slots = asyncio.Semaphore(BATCH_EMAIL_CONCURRENCY)
+
+    async def generate(i, profile_dict):
+        line = {"index": i, "profile_id": profile_dict.get("profile_id")}
+        async with slots:
+            await chat_rate_limit.wait()
+            try:
+                with metrics.span("chat_completion"):
+                    resp = await async_openai_client.chat.completions.create(
+                        model="gpt-4",
+                        messages=[{"role": "user", "content": email_prompt(profile_dict, context, shared)}],
+                        timeout=CHAT_TIMEOUT,
+                    )
+                metrics.tokens("gpt-4", resp.usage)
+                line["email"] = resp.choices[0].message.content
+            except Exception as e:
+                line["error"] = f"Error generating message: {str(e)}"
+        return line
+
+    async def events():
+        if error:
+            yield json.dumps({"error": error}) + "\n"
+            return
+        tasks = [asyncio.create_task(generate(i, p)) for i, p in enumerate(profile_list)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Client gone: don't keep paying for completions nobody will read
+            for task in tasks:
+                task.cancel()
+        yield json.dumps({"done": True}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+# — Observability —
+@app.get("/metrics")
+def prometheus_metrics():
+    """Stage/request latency histograms and token counters of this worker, in the Prometheus text format."""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/debug/profile")
+async def debug_profile(seconds: float = 10, interval_ms: float = 5):
+    """Sample all threads of this worker for `seconds`; returns collapsed stacks for a flame graph."""
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled (PROFILER_ENABLED=1 to allow it)")
+    if not 0 < seconds <= 60 or interval_ms < 1:
+        raise HTTPException(status_code=400, detail="seconds must be in (0, 60] and interval_ms >= 1")
+    try:
+        stacks = await asyncio.to_thread(profiler.profile, seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(stacks)
+
 # — Endpoint: debug profiles —
 @app.get("/api/debug-profiles")
-def debug_profiles(limit: int = 5):
-    hits = qdrant.scroll(
-        collection_name=COLLECTION_NAME,
-        limit=limit,
-        with_payload=True
-    )[0]
-    return [h.payload for h in hits]
\ No newline at end of file
+async def debug_profiles(limit: int = 5):
+    return await store.ascroll(COLLECTION_NAME, limit)
\ No newline at end of file
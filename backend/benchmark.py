@@ -0,0 +1,380 @@
+"""Offline benchmark: ingest throughput, API startup, memory and search/email latency.
+
+    python benchmark.py                                    # 2000 synthetic profiles, concurrency 1 8 32
+    python benchmark.py --profiles 20000 --concurrency 1 16 64 --json bench.json
+    python benchmark.py --store numpy --quantization scalar --json numpy.json --compare bench.json
+
+Everything runs in this process with no network or API key: profiles are synthetic records shaped
+like the scraper's linkedin_profiles_raw_*.json dumps, Qdrant is in-memory (QDRANT_URL=:memory:),
+and OpenAI is a local stand-in server reached through OPENAI_BASE_URL, so the real client, retries
+and streaming code paths are exercised. Its embeddings are deterministic hashed bags of words (texts
+that share words land close together) and its completions are canned text, each after
+--embed-latency-ms / --chat-latency-ms. Requests go to the app through httpx's ASGI transport.
+Same seed and arguments give the same corpus and queries, so two --json reports can be diffed with
+--compare.
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import lru_cache
+import numpy as np
+
+# — Synthetic corpus —
+FIRST = ["Alex", "Priya", "Jordan", "Wei", "Maria", "Sam", "Aisha", "Diego", "Hana", "Noah", "Leila", "Omar",
+         "Grace", "Ravi", "Chloe", "Mateo", "Yuki", "Ethan", "Zara", "Lucas"]
+LAST = ["Chen", "Patel", "Garcia", "Kim", "Nguyen", "Smith", "Singh", "Lopez", "Wang", "Cohen", "Okafor",
+        "Rossi", "Tanaka", "Brown", "Ali", "Martin", "Silva", "Park", "Khan", "Müller"]
+COMPANIES = ["Google", "Meta", "Apple", "Microsoft", "Amazon", "Stripe", "Databricks", "OpenAI", "Anthropic",
+             "Salesforce", "Airbnb", "Uber", "Lyft", "Nvidia", "Tesla", "McKinsey & Company", "Goldman Sachs",
+             "Bain & Company", "Genentech", "Palantir", "Figma", "Notion", "Scale AI", "Deloitte", "LinkedIn"]
+TITLES = ["Software Engineer", "Senior Software Engineer", "Product Manager", "Data Scientist",
+          "Machine Learning Engineer", "Research Scientist", "Consultant", "Investment Banking Analyst",
+          "Product Designer", "Engineering Manager", "Founder", "Venture Capital Associate", "Analyst"]
+SCHOOLS = ["University of California, Berkeley", "UC Berkeley Haas School of Business",
+           "UC Berkeley College of Engineering", "Stanford University", "Massachusetts Institute of Technology",
+           "Carnegie Mellon University", "University of Michigan"]
+DEGREES = ["BS Electrical Engineering and Computer Sciences", "BA Computer Science", "BA Economics",
+           "MBA", "MEng", "BS Data Science", "PhD Statistics", "BA Cognitive Science"]
+CITIES = ["Berkeley, California, United States", "San Francisco, California, United States",
+          "New York, New York, United States", "Seattle, Washington, United States",
+          "Los Angeles, California, United States", "Austin, Texas, United States", "London, England, United Kingdom"]
+WORDS = ("building scalable distributed systems machine learning infrastructure product strategy growth "
+         "analytics consulting finance healthcare climate robotics startups mentoring recruiting data "
+         "pipelines cloud security payments marketplaces search ranking recommendation design research "
+         "leadership operations fintech biotech hardware compilers databases frontend backend mobile "
+         "investing strategy entrepreneurship education nonprofit policy sustainability energy").split()
+
+def synthetic_profile(rng, i, about_words):
+    name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+    company = rng.choice(COMPANIES)
+    title = rng.choice(TITLES)
+    school = rng.choice(SCHOOLS)
+    experience = [{
+        "title": rng.choice(TITLES), "company": rng.choice(COMPANIES),
+        "start_date": f"{2010 + j}", "end_date": f"{2012 + j}",
+        "description": " ".join(rng.choices(WORDS, k=20)),
+    } for j in range(rng.randint(1, 5))]
+    experience.insert(0, {"title": title, "company": company, "start_date": "2023", "end_date": "Present"})
+    return {
+        "id": f"bench-{i:07d}",
+        "name": name,
+        "city": rng.choice(CITIES),
+        "position": f"{title} at {company}",
+        "about": " ".join(rng.choices(WORDS, k=about_words)),
+        "current_company": {"name": company, "link": f"https://www.linkedin.com/company/{company.lower()}"},
+        "experience": experience,
+        "educations_details": school,
+        "education": [{"title": school, "degree": rng.choice(DEGREES), "start_year": "2014", "end_year": "2018"}],
+        "followers": rng.randint(50, 5000),
+        "connections": rng.randint(50, 500),
+        "people_also_viewed": [{"name": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+                                "profile_link": f"https://www.linkedin.com/in/x{rng.randint(0, 10**6)}"}
+                               for _ in range(5)],
+        "url": f"https://www.linkedin.com/in/bench-{i:07d}",
+    }
+
+def write_corpus(directory, n, per_file, about_words, seed):
+    rng = random.Random(seed)
+    profiles = [synthetic_profile(rng, i, about_words) for i in range(n)]
+    for f, start in enumerate(range(0, n, per_file)):
+        with open(os.path.join(directory, f"linkedin_profiles_raw_{f:04d}.json"), "w") as out:
+            json.dump(profiles[start:start + per_file], out)
+    return profiles
+
+def make_queries(n, seed):
+    rng = random.Random(seed + 1)
+    kinds = [
+        lambda: f"{rng.choice(TITLES)} at {rng.choice(COMPANIES)}",
+        lambda: f"{' '.join(rng.choices(WORDS, k=3))} in {rng.choice(CITIES).split(',')[0]}",
+        lambda: f"Berkeley alumni working on {' '.join(rng.choices(WORDS, k=2))}",
+        lambda: rng.choice(COMPANIES),  # exact names take the lexical fast path
+    ]
+    return [rng.choice(kinds)() for _ in range(n)]
+
+# — OpenAI stand-in —
+@lru_cache(maxsize=100000)
+def _word_slot(word, dim):
+    h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+    return h % dim, 1.0 if h >> 63 else -1.0
+
+def fake_embedding(text, dim):
+    v = np.zeros(dim, dtype=np.float32)
+    for word in text.lower().split():
+        slot, sign = _word_slot(word, dim)
+        v[slot] += sign
+    norm = np.linalg.norm(v)
+    if not norm:
+        v[0], norm = 1.0, 1.0
+    return v / norm
+
+def openai_stand_in(dim, embed_latency, chat_latency):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    api = FastAPI()
+    reply = ("Hi there, I'm a Berkeley student and came across your work. I'd love to hear how you "
+             "got started and what you'd recommend to someone hoping to follow a similar path. "
+             "Would you be open to a quick chat? Thanks!")
+
+    @api.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(embed_latency)
+        d = body.get("dimensions") or dim
+        data = []
+        for i, text in enumerate(inputs):
+            v = fake_embedding(text if isinstance(text, str) else " ".join(map(str, text)), d)
+            emb = base64.b64encode(v.tobytes()).decode() if body.get("encoding_format") == "base64" \
+                else v.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": emb})
+        return {"object": "list", "data": data, "model": body["model"],
+                "usage": {"prompt_tokens": sum(len(str(t).split()) for t in inputs),
+                          "total_tokens": sum(len(str(t).split()) for t in inputs)}}
+
+    @api.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(reply.split()),
+                 "total_tokens": len(prompt.split()) + len(reply.split())}
+        base = {"id": "chatcmpl-bench", "created": int(time.time()), "model": body["model"]}
+        if not body.get("stream"):
+            await asyncio.sleep(chat_latency)
+            return {**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}]}
+
+        async def events():
+            words = reply.split(" ")
+            for i, word in enumerate(words):
+                await asyncio.sleep(chat_latency / len(words))
+                delta = {"content": word if i == 0 else " " + word}
+                yield "data: " + json.dumps({**base, "object": "chat.completion.chunk", "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": None}]}) + "\n\n"
+            yield "data: " + json.dumps({**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {}, "finish_reason": "stop"}]}) + "\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield "data: " + json.dumps({**base, "object": "chat.completion.chunk", "choices": [],
+                                             "usage": usage}) + "\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return api
+
+def start_stand_in(api):
+    """Serve the stand-in on a free local port in a background thread; returns its base URL."""
+    import uvicorn
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(api, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/v1"
+
+# — Measurement —
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    rss = resource.getrusage(who).ru_maxrss
+    return round(rss / 2**20 if sys.platform == "darwin" else rss / 2**10, 1)  # bytes on macOS, KiB on Linux
+
+def latency_stats(latencies, errors, elapsed):
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+async def load(send, requests, concurrency):
+    """Issue `requests` calls of send(i) with `concurrency` in flight; latency stats of the lot."""
+    latencies, errors, counter = [], 0, iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                resp = await send(i)
+                failed = resp.status_code >= 400 or "error" in resp.json()
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latency_stats(latencies, errors, time.perf_counter() - start)
+
+async def run(args, corpus, queries):
+    import httpx
+    import ingest
+    from config import COLLECTION_NAME, store
+
+    start = time.perf_counter()
+    await ingest.run_ingest(rebuild=True)
+    ingest_seconds = time.perf_counter() - start
+    snap = ingest.ingest_progress.snapshot()
+    chunks = await asyncio.to_thread(store.count, COLLECTION_NAME)
+    report = {"ingest": {
+        "profiles": len(corpus),
+        "chunks": chunks,
+        "seconds": round(ingest_seconds, 2),
+        "chunks_per_second": round(chunks / ingest_seconds, 1),
+        "chunking_chunks_per_second": snap["chunking_chunks_per_second"],
+        "peak_rss_mb": peak_rss_mb(),
+    }}
+    print(f"Ingested {len(corpus)} profiles / {chunks} chunks in {ingest_seconds:.2f}s")
+
+    start = time.perf_counter()
+    import app as api
+    await api.startup_event()
+    if api.lexical_sync_task is not None:
+        await api.lexical_sync_task
+    report["startup_seconds"] = round(time.perf_counter() - start, 3)
+    print(f"API ready in {report['startup_seconds']}s")
+
+    rng = random.Random(args.seed + 2)
+    search_queries = [rng.choice(queries) for _ in range(args.requests)]
+    # Shaped like the search results the UI posts back
+    email_profiles = [json.dumps({"profile_id": p["id"], "name": p["name"], "title": p["position"],
+                                  "current_company": p["current_company"]["name"], "url": p["url"]})
+                      for p in rng.choices(corpus, k=args.email_requests or args.requests)]
+    report["search"], report["email"] = {}, {}
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for c in args.concurrency:
+            # The app logs every query; keep that out of the report unless asked for
+            with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO()):
+                report["search"][str(c)] = await load(
+                    lambda i: client.post("/api/search", json={"query": search_queries[i], "k": args.k}),
+                    args.requests, c)
+                report["email"][str(c)] = await load(
+                    lambda i: client.post("/api/email", data={
+                        "profile": email_profiles[i], "context": "I'm a Berkeley EECS junior interested in ML."}),
+                    len(email_profiles), c)
+            s, e = report["search"][str(c)], report["email"][str(c)]
+            print(f"concurrency {c:>4}: search p50 {s['p50_ms']} / p95 {s['p95_ms']} / p99 {s['p99_ms']} ms, "
+                  f"email p50 {e['p50_ms']} / p95 {e['p95_ms']} / p99 {e['p99_ms']} ms")
+    report["cache_stats"] = api.cache_stats()
+    report["stage_ms"] = {stage: round(1000 * seconds / n, 3)
+                          for stage, (n, seconds) in sorted(api.metrics.stage_summary().items())}
+    await api.shutdown_event()
+    report["peak_rss_mb"] = peak_rss_mb()
+    report["peak_rss_children_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return report
+
+# — Reporting —
+def flatten(d, prefix=""):
+    out = {}
+    for key, value in d.items():
+        if isinstance(value, dict):
+            out.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[prefix + key] = value
+    return out
+
+def compare(old, new):
+    """Side-by-side of every numeric metric the two reports share."""
+    a, b = flatten({k: old[k] for k in old if k not in ("meta", "cache_stats")}), \
+        flatten({k: new[k] for k in new if k not in ("meta", "cache_stats")})
+    print(f"\n{'metric':<42}{'before':>12}{'after':>12}{'change':>10}")
+    for key in sorted(a.keys() & b.keys()):
+        change = f"{100 * (b[key] - a[key]) / a[key]:+.1f}%" if a[key] else "-"
+        print(f"{key:<42}{a[key]:>12g}{b[key]:>12g}{change:>10}")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of ingest and the search/email API")
+    parser.add_argument("--profiles", type=int, default=2000, help="synthetic profiles to generate")
+    parser.add_argument("--profiles-per-file", type=int, default=1000)
+    parser.add_argument("--about-words", type=int, default=120, help="words in each synthetic 'about'")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="search requests per concurrency level")
+    parser.add_argument("--email-requests", type=int, default=0, help="email requests per level (default: --requests)")
+    parser.add_argument("--queries", type=int, default=100, help="distinct search queries to sample from")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--store", choices=["qdrant", "numpy"], default="qdrant")
+    parser.add_argument("--quantization", default="none")
+    parser.add_argument("--embed-latency-ms", type=float, default=50)
+    parser.add_argument("--chat-latency-ms", type=float, default=800)
+    parser.add_argument("--cold", action="store_true", help="disable the query-vector and result caches")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="keep the app's per-request logging")
+    parser.add_argument("--json", help="write the report here")
+    parser.add_argument("--compare", help="earlier --json report to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bearlink-bench-")
+    profiles_dir = os.path.join(workdir, "profiles")
+    os.makedirs(profiles_dir)
+    start = time.perf_counter()
+    corpus = write_corpus(profiles_dir, args.profiles, args.profiles_per_file, args.about_words, args.seed)
+    print(f"Wrote {len(corpus)} synthetic profiles to {profiles_dir} in {time.perf_counter() - start:.1f}s")
+
+    dim = int(os.getenv("EMBED_DIMENSIONS", "0")) or 1536
+    base_url = start_stand_in(openai_stand_in(dim, args.embed_latency_ms / 1000, args.chat_latency_ms / 1000))
+    # config reads these on import, so they have to be set before ingest/app are imported
+    os.environ.update({
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": base_url,
+        "QDRANT_URL": ":memory:",
+        "VECTOR_STORE": args.store,
+        "VECTOR_QUANTIZATION": args.quantization,
+        "VECTOR_DIR": os.path.join(workdir, "vector_index"),
+        "PROFILES_DIR": profiles_dir,
+        "EMBED_CACHE_PATH": os.path.join(workdir, "embeddings_cache.sqlite3"),
+        "INGEST_MANIFEST_PATH": os.path.join(workdir, "ingest_manifest.json"),
+        "INGEST_STATUS_PATH": os.path.join(workdir, "ingest_status.json"),
+        "SIMILAR_PATH": os.path.join(workdir, "similar_profiles.json"),
+        "INGEST_ON_STARTUP": "0",
+        "INGEST_WATCH": "0",
+    })
+    if args.cold:
+        os.environ.update({"QUERY_CACHE_SIZE": "0", "RESULT_CACHE_SIZE": "0", "QUERY_CACHE_PERSIST": "0"})
+
+    report = asyncio.run(run(args, corpus, make_queries(args.queries, args.seed)))
+    report["meta"] = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+    }
+    print(f"Peak RSS {report['peak_rss_mb']} MB (preprocessing workers {report['peak_rss_children_mb']} MB)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
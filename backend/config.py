@@ -0,0 +1,95 @@
+import os
+from dotenv import load_dotenv
+import httpx
+import tiktoken
+from openai import AsyncOpenAI
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from metrics import Metrics
+from vector_store import make_store
+
+# — Settings shared by the API (app.py) and the ingest command (ingest.py) —
+load_dotenv()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+QDRANT_URL      = os.getenv("QDRANT_URL", "http://localhost:6333")
+EMBED_MODEL     = os.getenv("EMBED_MODEL", "text-embedding-ada-002")
+# text-embedding-3-* can return shortened vectors; changing model or dimensions needs `ingest.py --rebuild`
+EMBED_DIMENSIONS = int(os.getenv("EMBED_DIMENSIONS", "0")) or None
+EMBED_DIM       = EMBED_DIMENSIONS or {"text-embedding-3-large": 3072}.get(EMBED_MODEL, 1536)
+EMBED_CACHE_MODEL = f"{EMBED_MODEL}:{EMBED_DIMENSIONS}" if EMBED_DIMENSIONS else EMBED_MODEL  # cache key tag
+COLLECTION_NAME = "linkedin_profiles"  # alias; the real collections are versioned linkedin_profiles_v<ms>
+MAX_TOKENS      = 2048
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "embeddings_cache.sqlite3")
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "100000"))
+EMBED_BATCH_INPUTS = int(os.getenv("EMBED_BATCH_INPUTS", "256"))
+EMBED_CONCURRENCY  = int(os.getenv("EMBED_CONCURRENCY", "4"))
+UPSERT_BATCH_SIZE  = 100
+INGEST_WINDOW      = int(os.getenv("INGEST_WINDOW", "512"))  # chunks read ahead of the embedding stage
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(os.cpu_count() or 1)))  # processes turning dumps into text
+PROFILES_DIR       = os.getenv("PROFILES_DIR", "../linkedin_profiles_prod")
+MANIFEST_PATH      = os.getenv("INGEST_MANIFEST_PATH", "ingest_manifest.json")
+INGEST_STATUS_PATH = os.getenv("INGEST_STATUS_PATH", "ingest_status.json")
+INGEST_WATCH       = os.getenv("INGEST_WATCH", "0") == "1"
+# Only for single-process local dev: with --workers N every worker would ingest
+INGEST_ON_STARTUP  = os.getenv("INGEST_ON_STARTUP", "0") == "1"
+VECTOR_STORE       = os.getenv("VECTOR_STORE", "qdrant")  # "qdrant" or "numpy" (in-process, no server)
+VECTOR_DIR         = os.getenv("VECTOR_DIR", "vector_index")
+# "none", "scalar" (int8, 4x smaller) or "binary" (1 bit/dim, 32x smaller). Qdrant applies it to
+# collections created after the change (`ingest.py --rebuild`), the numpy store when it loads one
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+VECTOR_ON_DISK     = os.getenv("VECTOR_ON_DISK", "0") == "1"   # Qdrant: keep original vectors on disk
+QUANT_RESCORE      = os.getenv("QUANT_RESCORE", "1") == "1"    # re-rank quantized candidates with originals
+QUANT_OVERSAMPLING = float(os.getenv("QUANT_OVERSAMPLING", "2.0"))
+QUERY_CACHE_SIZE   = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+QUERY_CACHE_TTL    = int(os.getenv("QUERY_CACHE_TTL", str(24 * 3600)))
+QUERY_CACHE_PERSIST = os.getenv("QUERY_CACHE_PERSIST", "1") == "1"  # back the LRU with EMBED_CACHE_PATH
+QUERY_BATCH_WINDOW_MS = float(os.getenv("QUERY_BATCH_WINDOW_MS", "10"))  # coalesce concurrent query embeds
+QUERY_BATCH_MAX    = int(os.getenv("QUERY_BATCH_MAX", "64"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+OPENAI_TIMEOUT     = float(os.getenv("OPENAI_TIMEOUT", "30"))   # seconds, embeddings
+CHAT_TIMEOUT       = float(os.getenv("CHAT_TIMEOUT", "120"))    # seconds, chat completions
+BATCH_EMAIL_MAX    = int(os.getenv("BATCH_EMAIL_MAX", "25"))            # profiles per batch request
+BATCH_EMAIL_CONCURRENCY = int(os.getenv("BATCH_EMAIL_CONCURRENCY", "5"))  # completions in flight per batch
+CHAT_RATE_LIMIT_RPM = int(os.getenv("CHAT_RATE_LIMIT_RPM", "0"))  # batch completions/min per worker, 0 = off
+MAX_UPLOAD_BYTES   = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 2**20)))
+FILE_CONTEXT_TOKENS = int(os.getenv("FILE_CONTEXT_TOKENS", "1500"))  # uploaded text kept in the prompt
+EXTRACT_WORKERS    = int(os.getenv("EXTRACT_WORKERS", "2"))            # processes parsing uploads
+EXTRACT_CACHE_SIZE = int(os.getenv("EXTRACT_CACHE_SIZE", "256"))
+EXTRACT_CACHE_TTL  = int(os.getenv("EXTRACT_CACHE_TTL", "3600"))
+QDRANT_TIMEOUT     = int(os.getenv("QDRANT_TIMEOUT", "10"))
+RESULT_CACHE_SIZE  = int(os.getenv("RESULT_CACHE_SIZE", "1000"))
+RESULT_CACHE_TTL   = int(os.getenv("RESULT_CACHE_TTL", "600"))
+SEARCH_MAX_K       = int(os.getenv("SEARCH_MAX_K", "50"))        # profiles per page
+SEARCH_MAX_DEPTH   = int(os.getenv("SEARCH_MAX_DEPTH", "500"))   # how far pagination can go
+# Payload fields search can filter on; ingest gives each a keyword index
+FILTER_FIELDS      = ("current_company", "experience_companies", "location", "schools")
+FILTER_FACET_LIMIT = int(os.getenv("FILTER_FACET_LIMIT", "100"))  # values offered per filter in the UI
+HYBRID_SEARCH      = os.getenv("HYBRID_SEARCH", "1") == "1"      # fuse BM25 with the vector hits
+LEXICAL_FAST_PATH  = os.getenv("LEXICAL_FAST_PATH", "1") == "1"  # exact-name queries skip the embedding
+RRF_K              = int(os.getenv("RRF_K", "60"))
+SIMILAR_PATH       = os.getenv("SIMILAR_PATH", "similar_profiles.json")  # neighbor graph ingest keeps up to date
+SIMILAR_K          = int(os.getenv("SIMILAR_K", "20"))                # neighbors kept per profile
+SIMILAR_LINK_BOOST = float(os.getenv("SIMILAR_LINK_BOOST", "0.1"))    # added for scraped "similar" links
+METRICS_ENABLED    = os.getenv("METRICS_ENABLED", "1") == "1"    # timing spans and counters for /metrics
+PROFILER_ENABLED   = os.getenv("PROFILER_ENABLED", "0") == "1"   # allow GET /api/debug/profile
+
+# One keep-alive pool per upstream, sized for hundreds of concurrent requests on a single worker
+http_limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+async_openai_client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    timeout=OPENAI_TIMEOUT,
+    http_client=httpx.AsyncClient(limits=http_limits, timeout=OPENAI_TIMEOUT),
+)
+if QDRANT_URL == ":memory:":
+    # In-process Qdrant (benchmark.py, notebooks): one client, so ingest and search share the data
+    qdrant = QdrantClient(location=":memory:")
+    async_qdrant = None
+else:
+    qdrant = QdrantClient(url=QDRANT_URL, timeout=QDRANT_TIMEOUT)
+    async_qdrant = AsyncQdrantClient(url=QDRANT_URL, timeout=QDRANT_TIMEOUT, limits=http_limits) \
+        if VECTOR_STORE == "qdrant" else None
+encoding = tiktoken.encoding_for_model(EMBED_MODEL)
+store = make_store(VECTOR_STORE, qdrant, VECTOR_DIR, EMBED_DIM, async_qdrant,
+                   quantization=VECTOR_QUANTIZATION, on_disk=VECTOR_ON_DISK,
+                   rescore=QUANT_RESCORE, oversampling=QUANT_OVERSAMPLING)
+metrics = Metrics(METRICS_ENABLED)
@@ -0,0 +1,25 @@
+"""Text extraction for files uploaded with /api/email*.
+
+extract_text runs in a worker process (PDF parsing is CPU-bound and would stall the event loop),
+so it only takes and returns plain values.
+"""
+import io
+
+def extract_text(content, extension):
+    if extension == "pdf":
+        import PyPDF2
+        reader = PyPDF2.PdfReader(io.BytesIO(content))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    if extension == "txt":
+        return content.decode("utf-8", errors="replace")
+    if extension == "docx":
+        import docx
+        return "\n".join(para.text for para in docx.Document(io.BytesIO(content)).paragraphs)
+    raise ValueError(f"Unsupported file type: {extension}")
+
+def trim_to_tokens(text, encoding, max_tokens):
+    """Cut text down to at most max_tokens tokens."""
+    ids = encoding.encode(text)
+    if len(ids) <= max_tokens:
+        return text
+    return encoding.decode(ids[:max_tokens])
@@ -0,0 +1,50 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+class EmbeddingCache:
+    """On-disk float32 embedding store keyed by sha256(model, text)."""
+
+    def __init__(self, path, model):
+        self.model = model
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts):
+        """Return {text: vector} for every text already in the cache."""
+        keys = {self.key(t): t for t in texts}
+        found = {}
+        key_list = list(keys)
+        with self._lock:
+            for i in range(0, len(key_list), _LOOKUP_BATCH):
+                batch = key_list[i:i+_LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for k, blob in rows:
+                    found[keys[k]] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, items):
+        """Store an iterable of (text, vector) pairs."""
+        rows = [(self.key(t), array("f", v).tobytes()) for t, v in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
@@ -0,0 +1,115 @@
+import asyncio
+import random
+import time
+from collections import deque
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+def token_batches(texts, encoding, max_tokens, max_inputs, counts=None):
+    """Pack texts into multi-input requests of at most max_tokens / max_inputs each.
+
+    counts maps texts to token counts already known upstream, so they aren't encoded again.
+    """
+    counts = counts or {}
+    batch, batch_tokens = [], 0
+    for t in texts:
+        n = counts.get(t)
+        if n is None:
+            n = len(encoding.encode(t))
+        if batch and (batch_tokens + n > max_tokens or len(batch) >= max_inputs):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(t)
+        batch_tokens += n
+    if batch:
+        yield batch
+
+async def embed_batch(client, model, batch, max_retries=6, dimensions=None, metrics=None):
+    """One multi-input embeddings call with exponential backoff on rate limits and transient errors.
+
+    dimensions asks text-embedding-3-* models for shortened vectors; metrics counts the tokens used.
+    """
+    kwargs = {"dimensions": dimensions} if dimensions else {}
+    for attempt in range(max_retries + 1):
+        try:
+            resp = await client.embeddings.create(model=model, input=batch, **kwargs)
+            if metrics is not None:
+                metrics.tokens(model, resp.usage)
+            return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = min(60, 2 ** attempt) + random.random()
+            print(f"Embedding batch of {len(batch)} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+class QueryCoalescer:
+    """Collects query texts arriving within window_ms and embeds them in one multi-input request."""
+
+    def __init__(self, client, model, window_ms=10, max_batch=64, max_retries=2, dimensions=None, metrics=None):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.metrics = metrics
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self._pending = []
+        self._timer = None
+        self._tasks = set()  # in-flight batches; the loop only holds weak references to tasks
+        self.batches = 0
+        self.requests = 0
+        self.max_batch_seen = 0
+        self._delays = deque(maxlen=1000)
+
+    async def embed(self, text):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((text, fut, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        now = time.perf_counter()
+        self.batches += 1
+        self.requests += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self._delays.extend(now - queued for _, _, queued in batch)
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            embs = dict(zip(texts, await embed_batch(self.client, self.model, texts, self.max_retries,
+                                                  self.dimensions, self.metrics)))
+        except Exception as e:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for text, fut, _ in batch:
+            if not fut.done():
+                fut.set_result(embs[text])
+
+    def stats(self):
+        delays = sorted(self._delays)
+        return {
+            "window_ms": self.window * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "avg_queue_delay_ms": round(1000 * sum(delays) / len(delays), 2) if delays else 0.0,
+            "p95_queue_delay_ms": round(1000 * delays[int(0.95 * (len(delays) - 1))], 2) if delays else 0.0,
+        }
@@ -0,0 +1,360 @@
+"""Build or update the profile index in the vector store (Qdrant by default).
+
+Run this as its own process (API workers never ingest):
+
+    python ingest.py            # apply new/changed/removed profiles to the live collection
+    python ingest.py --rebuild  # blue/green: build a new versioned collection, then swap the alias
+    python ingest.py --watch    # keep running and apply deltas as new dumps land in PROFILES_DIR
+"""
+import argparse
+import asyncio
+import contextlib
+import time
+from itertools import islice
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent runs aren't serialized
+    fcntl = None
+from config import (
+    COLLECTION_NAME,
+    EMBED_BATCH_INPUTS,
+    EMBED_BATCH_TOKENS,
+    EMBED_CACHE_MODEL,
+    EMBED_CACHE_PATH,
+    EMBED_CONCURRENCY,
+    EMBED_DIMENSIONS,
+    EMBED_MODEL,
+    FILTER_FIELDS,
+    INGEST_WINDOW,
+    INGEST_STATUS_PATH,
+    INGEST_WATCH,
+    MANIFEST_PATH,
+    MAX_TOKENS,
+    PREPROCESS_WORKERS,
+    PROFILES_DIR,
+    SIMILAR_K,
+    SIMILAR_LINK_BOOST,
+    SIMILAR_PATH,
+    UPSERT_BATCH_SIZE,
+    async_openai_client,
+    encoding,
+    metrics,
+    store,
+)
+from embed_cache import EmbeddingCache
+from embedding_pipeline import embed_batch, token_batches
+from manifest import Manifest, content_hash, point_id
+from profile_loader import profile_to_text, refresh_store
+from progress import IngestProgress
+from similar_profiles import SimilarityGraph, card
+
+embed_cache = EmbeddingCache(EMBED_CACHE_PATH, EMBED_CACHE_MODEL)
+ingest_progress = IngestProgress(INGEST_STATUS_PATH)
+
+# — Utilities —
+def chunk_by_tokens(text):
+    """(chunk text, token count) for each MAX_TOKENS window of text."""
+    ids = encoding.encode(text)
+    windows = [ids[i:i+MAX_TOKENS] for i in range(0, len(ids), MAX_TOKENS)]
+    return list(zip(encoding.decode_batch(windows), map(len, windows)))
+
+# — Collections and alias —
+def create_versioned_collection():
+    name = f"{COLLECTION_NAME}_v{int(time.time() * 1000)}"
+    store.create_collection(name)
+    print(f"Created collection {name}")
+    return name
+
+def switch_alias(new_collection):
+    """Atomically repoint the alias at new_collection. Returns the previous target."""
+    old = store.switch_alias(COLLECTION_NAME, new_collection)
+    print(f"Alias {COLLECTION_NAME} -> {new_collection}")
+    return old
+
+# — Ingest pipeline —
+async def upsert_worker(queue, collection, profile_vectors=None):
+    """Drain (id, vector, payload) points from the queue into the store in batches of UPSERT_BATCH_SIZE.
+
+    profile_vectors, if given, collects the sum of each profile's chunk vectors for the similarity graph.
+    """
+    points, total = [], 0
+    while True:
+        point = await queue.get()
+        if point is not None:
+            points.append(point)
+            if profile_vectors is not None:
+                pid = point[2]["profile_id"]
+                vec = np.asarray(point[1], dtype=np.float32)
+                profile_vectors[pid] = profile_vectors[pid] + vec if pid in profile_vectors else vec
+        if points and (point is None or len(points) >= UPSERT_BATCH_SIZE):
+            with metrics.span("ingest_upsert_batch"):
+                await asyncio.to_thread(store.upsert, collection, points)
+            total += len(points)
+            ingest_progress.chunks_upserted += len(points)
+            ingest_progress.save()
+            points = []
+            print(f"Processed {total} chunks so far")
+        if point is None:
+            return total
+
+async def embed_worker(batches, points):
+    """Embed batches of [(text, [(point_id, payload), ...])] and pass the points on to the upsert stage."""
+    while (batch := await batches.get()) is not None:
+        texts = [t for t, _ in batch]
+        with metrics.span("ingest_embed_batch"):
+            embs = await embed_batch(async_openai_client, EMBED_MODEL, texts, dimensions=EMBED_DIMENSIONS,
+                                     metrics=metrics)
+        await asyncio.to_thread(embed_cache.put_many, list(zip(texts, embs)))
+        for (_, targets), emb in zip(batch, embs):
+            for pid, payload in targets:
+                ingest_progress.chunks_embedded += 1
+                await points.put((pid, emb, payload))
+
+async def ingest_chunks(chunks, collection, profile_vectors=None):
+    """Embed a stream of (point_id, payload, text, token count) chunks, cache-first, and upsert them.
+
+    Chunks are pulled INGEST_WINDOW at a time and every stage hands off through a bounded
+    queue, so memory stays flat no matter how large the corpus is.
+    """
+    points = asyncio.Queue(maxsize=UPSERT_BATCH_SIZE * 4)
+    batches = asyncio.Queue(maxsize=EMBED_CONCURRENCY * 2)
+    upserter = asyncio.create_task(upsert_worker(points, collection, profile_vectors))
+    chunks = iter(chunks)
+    hits = misses = 0
+
+    async def produce():
+        nonlocal hits, misses
+        while window := await asyncio.to_thread(lambda: list(islice(chunks, INGEST_WINDOW))):
+            ingest_progress.chunks_queued += len(window)
+            by_text, counts = {}, {}
+            for pid, payload, piece, n_tokens in window:
+                by_text.setdefault(piece, []).append((pid, payload))
+                counts[piece] = n_tokens
+            cached = await asyncio.to_thread(embed_cache.get_many, list(by_text))
+            for piece, emb in cached.items():
+                for pid, payload in by_text[piece]:
+                    ingest_progress.chunks_embedded += 1
+                    await points.put((pid, emb, payload))
+            missing = [t for t in by_text if t not in cached]
+            hits, misses = hits + len(cached), misses + len(missing)
+            for batch in token_batches(missing, encoding, EMBED_BATCH_TOKENS, EMBED_BATCH_INPUTS, counts):
+                await batches.put([(t, by_text[t]) for t in batch])
+        for _ in range(EMBED_CONCURRENCY):
+            await batches.put(None)
+
+    tasks = [asyncio.create_task(produce())]
+    tasks += [asyncio.create_task(embed_worker(batches, points)) for _ in range(EMBED_CONCURRENCY)]
+    try:
+        # The upserter is watched too: if it fails, nothing drains `points` and the other stages
+        # would block on put() forever. It only returns after the sentinel, so stop once the rest are done.
+        pending = set(tasks) | {upserter}
+        while pending - {upserter}:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+    except BaseException:
+        for task in tasks + [upserter]:
+            task.cancel()
+        raise
+    await points.put(None)
+    total = await upserter
+    print(f"Embedding cache: {hits} hits, {misses} misses")
+    print(f"Final batch: processed {total} chunks total")
+    for stage, (n, seconds) in sorted(metrics.stage_summary().items()):
+        if stage.startswith("ingest_"):
+            print(f"{stage}: {n} batches, {seconds:.2f}s total, {1000 * seconds / n:.1f} ms avg")
+
+def profile_payloads(p):
+    """Point payloads for a profile's chunks, and each chunk's token count."""
+    payloads, counts = [], []
+    txt = p.get("text") or profile_to_text(p)
+    # The store already knows the token count, so single-chunk profiles skip the tokenizer
+    pieces = [(txt, p["tokens"])] if p.get("tokens", MAX_TOKENS + 1) <= MAX_TOKENS else chunk_by_tokens(txt)
+    for piece, n_tokens in pieces:
+        counts.append(n_tokens)
+        payloads.append({
+            "profile_id": p["id"],
+            "current_company": (p.get("current_company") or {}).get("name"),
+            "experience_companies": [e.get("company") for e in (p.get("experience") or []) if e.get("company")],
+            "location": p.get("location"),
+            "schools": p.get("schools") or [],
+            "text": piece,
+            "url": p.get("url"),
+        })
+    return payloads, counts
+
+async def sync_collection(collection):
+    """Bring `collection` in line with PROFILES_DIR, touching only new, changed or removed profiles."""
+    manifest = Manifest(MANIFEST_PATH, collection)
+    # Keyword indexes let filtered searches narrow candidates inside the ANN search (no-op if they exist)
+    await asyncio.to_thread(store.create_keyword_indexes, collection, ("profile_id",) + FILTER_FIELDS)
+    if await asyncio.to_thread(store.count, collection) == 0:
+        # Empty collection: whatever the manifest says is no longer there
+        manifest.clear()
+    current = {}  # profile_id -> (content hash, chunk count)
+    stale = []
+    graph = await asyncio.to_thread(SimilarityGraph(SIMILAR_PATH, SIMILAR_K, SIMILAR_LINK_BOOST).load, True)
+    in_graph = set(graph.ids)
+    profile_vectors, cards, links = {}, {}, {}
+    backfill = {}  # unchanged profiles the graph doesn't have yet -> their chunk texts
+
+    def timed_profiles():
+        # Chunking throughput covers the whole path from dumps to payloads: the store refresh (where
+        # the preprocessing pool runs), reading each record back, and profile_payloads below
+        start = time.perf_counter()
+        store = refresh_store(PROFILES_DIR, encoding, ingest_progress, PREPROCESS_WORKERS)
+        ingest_progress.profiles_total = store.count()  # the denominator of the ETA
+        profiles = iter(store)
+        while True:
+            p = next(profiles, None)
+            ingest_progress.chunking_seconds += time.perf_counter() - start
+            if p is None:
+                ingest_progress.profiles_total = ingest_progress.profiles_scanned
+                ingest_progress.scan_done = True
+                return
+            ingest_progress.profiles_scanned += 1
+            yield p
+            start = time.perf_counter()
+
+    def changed_chunks():
+        for p in timed_profiles():
+            pid = p.get("id")
+            if not pid:
+                print(f"Skipping profile without ID: {p.get('name', 'Unknown')}")
+                continue
+            if pid in current:
+                continue
+            start = time.perf_counter()
+            payloads, counts = profile_payloads(p)
+            ingest_progress.chunking_seconds += time.perf_counter() - start
+            ingest_progress.chunks_built += len(payloads)
+            h = content_hash(payloads)
+            current[pid] = (h, len(payloads))
+            if p.get("related"):
+                links[pid] = p["related"]
+            if manifest.is_current(pid, h):
+                if pid not in in_graph:
+                    backfill[pid] = [payload["text"] for payload in payloads]
+                    cards[pid] = card(payloads[0])
+                continue
+            cards[pid] = card(payloads[0])
+            ingest_progress.profiles_changed += 1
+            stale.extend(manifest.stale_ids(pid, len(payloads)))
+            for i, (payload, n_tokens) in enumerate(zip(payloads, counts)):
+                yield point_id(pid, i), payload, payload["text"], n_tokens
+
+    await ingest_chunks(changed_chunks(), collection, profile_vectors)
+    stale.extend(manifest.removed_ids(current))
+    print(f"{ingest_progress.profiles_changed} new or changed profiles, {len(stale)} stale chunks to delete")
+    snapshot = ingest_progress.snapshot()
+    print(f"Built {ingest_progress.chunks_built} chunks at {snapshot['chunking_chunks_per_second']:.0f} chunks/s")
+    if stale:
+        await asyncio.to_thread(store.delete, collection, stale)
+    await asyncio.to_thread(store.flush, collection)
+    if ingest_progress.profiles_changed or stale:
+        ingest_progress.bump_index_version()
+
+    manifest.update(current)
+    manifest.save()
+    await update_similar(graph, profile_vectors, cards, links, current, backfill)
+
+async def update_similar(graph, profile_vectors, cards, links, current, backfill):
+    """Fold this sync into the similar-profiles graph; profiles it lacks come from the embedding cache."""
+    if backfill:
+        cached = await asyncio.to_thread(embed_cache.get_many, [t for texts in backfill.values() for t in texts])
+        for pid, texts in backfill.items():
+            if all(t in cached for t in texts):
+                profile_vectors[pid] = np.sum([cached[t] for t in texts], axis=0, dtype=np.float32)
+    with metrics.span("ingest_similar_graph"):
+        rewritten = await asyncio.to_thread(graph.update, profile_vectors, cards, links, current)
+        await asyncio.to_thread(graph.save)
+    print(f"Similar profiles: {rewritten} neighbor lists updated, {len(graph)} profiles in the graph")
+
+@contextlib.asynccontextmanager
+async def ingest_lock():
+    """One ingest at a time: --watch and a manual run share the manifest, status file and graph."""
+    with open(f"{INGEST_STATUS_PATH}.lock", "a") as f:
+        if fcntl:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print("Another ingest is running; waiting for it to finish")
+                await asyncio.to_thread(fcntl.flock, f, fcntl.LOCK_EX)
+        yield  # closing the file releases the lock
+
+async def run_ingest(rebuild=False, keep_old=False):
+    """Delta-sync the aliased collection, or build a fresh one and swap the alias when rebuild is set."""
+    async with ingest_lock():
+        ingest_progress.start()
+        created = None  # a collection this run built and hasn't put behind the alias yet
+        try:
+            target = await asyncio.to_thread(store.alias_target, COLLECTION_NAME)
+            if rebuild or target is None:
+                target = created = await asyncio.to_thread(create_versioned_collection)
+                ingest_progress.collection = target
+                await sync_collection(target)
+                old = await asyncio.to_thread(switch_alias, target)
+                created = None
+                ingest_progress.bump_index_version()
+                if old and old != target and not keep_old:
+                    await asyncio.to_thread(store.delete_collection, old)
+                    print(f"Deleted previous collection {old}")
+            else:
+                ingest_progress.collection = target
+                await sync_collection(target)
+        except Exception as e:
+            print(f"Ingest failed: {e}")
+            if created:
+                # Don't leave a half-built collection behind; the alias still points at the old one
+                try:
+                    await asyncio.to_thread(store.delete_collection, created)
+                    print(f"Deleted unfinished collection {created}")
+                except Exception as cleanup_error:
+                    print(f"Couldn't delete unfinished collection {created}: {cleanup_error}")
+            ingest_progress.finish(e)
+            raise
+        ingest_progress.finish()
+
+async def watch(interval=2.0):
+    """Re-sync whenever a JSON dump lands in PROFILES_DIR, debounced while it is still being written."""
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if not event.is_directory and event.src_path.endswith(".json"):
+                loop.call_soon_threadsafe(changed.set)
+
+    observer = Observer()
+    observer.schedule(Handler(), PROFILES_DIR)
+    observer.daemon = True
+    observer.start()
+    print(f"Watching {PROFILES_DIR} for new profile dumps")
+    while True:
+        await changed.wait()
+        # Wait until the file has stopped changing before reading it
+        while changed.is_set():
+            changed.clear()
+            await asyncio.sleep(interval)
+        try:
+            await run_ingest()
+        except Exception:
+            pass
+
+async def main(args):
+    await run_ingest(rebuild=args.rebuild, keep_old=args.keep_old)
+    if args.watch:
+        await watch()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest LinkedIn profile dumps into Qdrant")
+    parser.add_argument("--rebuild", action="store_true", help="build a new collection and swap the alias to it")
+    parser.add_argument("--keep-old", action="store_true", help="keep the previous collection after a rebuild")
+    parser.add_argument("--watch", action="store_true", help="keep running and apply deltas as new dumps land")
+    args = parser.parse_args()
+    args.watch = args.watch or INGEST_WATCH
+    asyncio.run(main(args))
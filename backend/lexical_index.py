@@ -0,0 +1,149 @@
+"""In-process BM25 index over profiles, used next to the vector store for hybrid search.
+
+Each document is one profile: the text of all its chunks plus its company, location and school
+fields. sync() diffs the store's payloads against what is indexed and only re-tokenizes the
+profiles that changed, so keeping up with an ingest is cheap.
+"""
+import hashlib
+import heapq
+import math
+import re
+import threading
+
+TOKEN_RE = re.compile(r"\w+")
+FIELD_KEYS = ("current_company", "experience_companies", "location", "schools")
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+def _field_values(payload):
+    for key in FIELD_KEYS:
+        values = payload.get(key)
+        for v in values if isinstance(values, list) else [values]:
+            if v:
+                yield v
+
+def matches(payload, filters):
+    """Same semantics as the vector store filters: every field holds one of its values."""
+    for field, values in (filters or {}).items():
+        have = payload.get(field)
+        have = set(have) if isinstance(have, list) else {have}
+        if not have & set(values):
+            return False
+    return True
+
+def rrf(*rankings, k=60):
+    """Reciprocal rank fusion of ranked lists of ids; returns ids by fused score."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class LexicalIndex:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.version = None
+        self.synced = False  # False until the first sync, so search knows to skip the lexical side
+        self._postings = {}  # term -> {profile_id: term frequency}
+        self._docs = {}      # profile_id -> (content hash, length, terms, phrases, payload)
+        self._total_len = 0
+        self._phrases = {}   # normalized company/school/location name -> number of profiles
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _add(self, pid, h, texts, payload):
+        fields = list(_field_values(payload))
+        tf = {}
+        for term in tokenize(" ".join(texts + fields)):
+            tf[term] = tf.get(term, 0) + 1
+        for term, n in tf.items():
+            self._postings.setdefault(term, {})[pid] = n
+        length = sum(tf.values())
+        self._total_len += length
+        phrases = {" ".join(tokenize(v)) for v in fields}
+        for phrase in phrases:
+            self._phrases[phrase] = self._phrases.get(phrase, 0) + 1
+        self._docs[pid] = (h, length, tuple(tf), phrases, payload)
+
+    def _remove(self, pid):
+        _, length, terms, phrases, _ = self._docs.pop(pid)
+        for term in terms:
+            posting = self._postings[term]
+            del posting[pid]
+            if not posting:
+                del self._postings[term]
+        for phrase in phrases:
+            self._phrases[phrase] -= 1
+            if not self._phrases[phrase]:
+                del self._phrases[phrase]
+        self._total_len -= length
+
+    def sync(self, payloads, version=None):
+        """Bring the index in line with an iterable of chunk payloads (all chunks of the collection).
+
+        Returns (added or changed, removed) profile counts.
+        """
+        with self._sync_lock:
+            if self.synced and version == self.version:
+                return 0, 0
+            chunks = {}
+            for p in payloads:
+                if p.get("profile_id"):
+                    chunks.setdefault(p["profile_id"], []).append(p)
+            changed = removed = 0
+            with self._lock:
+                for pid in [pid for pid in self._docs if pid not in chunks]:
+                    self._remove(pid)
+                    removed += 1
+            for pid, ps in chunks.items():
+                texts = sorted(p.get("text", "") for p in ps)
+                h = hashlib.sha256("\0".join(texts + list(_field_values(ps[0]))).encode()).hexdigest()
+                doc = self._docs.get(pid)
+                if doc and doc[0] == h:
+                    continue
+                # Return the chunk with the "name — position" header, like a vector hit on it would
+                payload = next((p for p in ps if "—" in p.get("text", "").split("\n", 1)[0]), ps[0])
+                with self._lock:
+                    if doc:
+                        self._remove(pid)
+                    self._add(pid, h, texts, payload)
+                changed += 1
+            self.version, self.synced = version, True
+            return changed, removed
+
+    def is_exact(self, query):
+        """A quoted query, or one that is exactly a known company, school or location name."""
+        q = query.strip()
+        if len(q) > 2 and q[0] == q[-1] == '"':
+            return True
+        return " ".join(tokenize(q)) in self._phrases
+
+    def search(self, query, limit, filters=None):
+        """Top `limit` (profile_id, score, payload) by BM25."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._docs)
+            if not n or not terms:
+                return []
+            avgdl = self._total_len / n
+            scores = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for pid, tf in posting.items():
+                    dl = self._docs[pid][1]
+                    scores[pid] = scores.get(pid, 0.0) + idf * tf * (self.k1 + 1) / (
+                        tf + self.k1 * (1 - self.b + self.b * dl / avgdl))
+            candidates = ((pid, s) for pid, s in scores.items() if matches(self._docs[pid][4], filters))
+            top = heapq.nlargest(limit, candidates, key=lambda x: x[1])
+            return [(pid, score, self._docs[pid][4]) for pid, score in top]
+
+    def stats(self):
+        return {"profiles": len(self._docs), "terms": len(self._postings), "version": self.version}
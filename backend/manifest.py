@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+import uuid
+
+# Fixed namespace so the same (profile_id, chunk) always maps to the same Qdrant point
+POINT_NAMESPACE = uuid.UUID("6f1c6a52-3c1e-4d8e-9b4a-bea71c0ffee0")
+
+def point_id(profile_id, chunk_i):
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{profile_id}:{chunk_i}"))
+
+def content_hash(payloads):
+    return hashlib.sha256(json.dumps(payloads, sort_keys=True).encode("utf-8")).hexdigest()
+
+class Manifest:
+    """Per-profile {hash, chunks} record of what is currently in a collection."""
+
+    def __init__(self, path, collection):
+        self.path = path
+        self.collection = collection
+        self.profiles = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            # A manifest written for another collection version says nothing about this one
+            if data.get("collection") == collection:
+                self.profiles = data.get("profiles", {})
+
+    def is_current(self, pid, h):
+        old = self.profiles.get(pid)
+        return bool(old) and old["hash"] == h
+
+    def stale_ids(self, pid, n_chunks):
+        """Point ids left over when a profile now has fewer chunks than last time."""
+        old = self.profiles.get(pid)
+        return [point_id(pid, i) for i in range(n_chunks, old["chunks"])] if old else []
+
+    def removed_ids(self, current):
+        """Point ids of every profile in the manifest that is no longer in `current`."""
+        return [point_id(pid, i) for pid, old in self.profiles.items() if pid not in current for i in range(old["chunks"])]
+
+    def update(self, current):
+        """current: {profile_id: (content hash, chunk count)}."""
+        self.profiles = {pid: {"hash": h, "chunks": n} for pid, (h, n) in current.items()}
+
+    def clear(self):
+        self.profiles = {}
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"collection": self.collection, "profiles": self.profiles}, f)
+        os.replace(tmp, self.path)
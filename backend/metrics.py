@@ -0,0 +1,160 @@
+"""Timing spans, counters and Prometheus text exposition, plus an on-demand sampling profiler.
+
+Each process keeps its own numbers (scrape every worker, or run one); with metrics disabled, span()
+hands back a shared no-op context and inc()/observe() return immediately.
+"""
+import contextlib
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+# Request and stage latencies run from sub-millisecond cache hits to multi-second completions
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+HELP = {
+    "bearlink_stage_seconds": ("histogram", "Time spent in each stage of a request or ingest run"),
+    "bearlink_stage_errors_total": ("counter", "Stages that ended in an exception"),
+    "bearlink_http_request_seconds": ("histogram", "Time to response headers, by route"),
+    "bearlink_http_requests_total": ("counter", "HTTP requests, by route and status"),
+    "bearlink_openai_tokens_total": ("counter", "OpenAI tokens used, by model and kind"),
+}
+_NOOP = contextlib.nullcontext()
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class Metrics:
+    def __init__(self, enabled=True, buckets=BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = [0] * (len(self.buckets) + 3)
+            h[bisect_left(self.buckets, value)] += 1  # slot len(buckets) is +Inf
+            h[-2] += value
+            h[-1] += 1
+
+    def span(self, stage):
+        """`with metrics.span("vector_search"):` times the block into bearlink_stage_seconds."""
+        return _Span(self, stage) if self.enabled else _NOOP
+
+    def tokens(self, model, usage):
+        """Count the prompt/completion tokens of an OpenAI response's usage object."""
+        if not self.enabled or usage is None:
+            return
+        self.inc("bearlink_openai_tokens_total", usage.prompt_tokens, model=model, kind="prompt")
+        completion = getattr(usage, "completion_tokens", None)
+        if completion:
+            self.inc("bearlink_openai_tokens_total", completion, model=model, kind="completion")
+
+    def stage_summary(self):
+        """{stage: (count, total seconds)}, for logging at the end of a CLI run."""
+        with self._lock:
+            return {dict(labels)["stage"]: (h[-1], h[-2]) for (name, labels), h in self._histograms.items()
+                    if name == "bearlink_stage_seconds"}
+
+    def render(self):
+        """Everything recorded so far in the Prometheus text format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((k, list(v)) for k, v in self._histograms.items())
+        lines, seen = [], set()
+
+        def header(name):
+            if name not in seen:
+                seen.add(name)
+                kind, text = HELP.get(name, ("untyped", ""))
+                lines.extend([f"# HELP {name} {text}", f"# TYPE {name} {kind}"])
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), h in histograms:
+            header(name)
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), h[:-2]):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {h[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {h[-1]}")
+        return "\n".join(lines) + "\n"
+
+class _Span:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe("bearlink_stage_seconds", time.perf_counter() - self.start, stage=self.stage)
+        if exc_type is not None and issubclass(exc_type, Exception):  # not cancellations
+            self.metrics.inc("bearlink_stage_errors_total", stage=self.stage)
+
+# — Sampling profiler —
+class SamplingProfiler:
+    """Samples every thread's stack for a while and returns them as collapsed stacks.
+
+    The output ("frame;frame;frame count" per line) loads straight into speedscope or flamegraph.pl.
+    Nothing runs between profiles; one profile at a time.
+    """
+
+    def __init__(self):
+        self._busy = threading.Lock()
+
+    @property
+    def running(self):
+        return self._busy.locked()
+
+    def profile(self, seconds, interval=0.005):
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            me = threading.get_ident()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = {}
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    frames = []
+                    while frame is not None:
+                        code = frame.f_code
+                        frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    key = ";".join([names.get(ident, str(ident))] + frames[::-1])
+                    stacks[key] = stacks.get(key, 0) + 1
+                time.sleep(interval)
+            return "".join(f"{stack} {n}\n" for stack, n in sorted(stacks.items(), key=lambda x: -x[1]))
+        finally:
+            self._busy.release()
@@ -0,0 +1,308 @@
+import argparse
+import contextlib
+import glob
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+from itertools import islice
+try:
+    import fcntl
+except ImportError:  # Windows: merges aren't serialized
+    fcntl = None
+
+# Only what profile_to_text, the point payload and the similar-profiles graph use; the rest of a
+# Bright Data record (activity, avatar, banner_image, ...) is dropped on read
+KEEP_FIELDS = ("id", "name", "position", "about", "url")
+STORE_NAME = "profiles.jsonl"
+STORE_FORMAT = 3  # bump when slim_profile changes, so the store is rebuilt from the dumps
+RAW_PATTERN = "linkedin_profiles_raw_*.json"
+SHARD_SIZE = 256  # raw records per preprocessing task
+PROFILE_URL_RE = re.compile(r"linkedin\.com/in/([^/?#]+)")
+
+def slim_profile(raw):
+    p = {k: raw[k] for k in KEEP_FIELDS if raw.get(k) is not None}
+    curr = (raw.get("current_company") or {}).get("name")
+    if curr:
+        p["current_company"] = {"name": curr}
+    p["experience"] = [
+        {"title": e.get("title"), "company": e.get("company")}
+        for e in (raw.get("experience") or [])
+        if e.get("title") or e.get("company")
+    ]
+    # "city" is the full "Berkeley, California, United States"; "location" is often missing
+    loc = raw.get("city") or raw.get("location")
+    if loc:
+        p["location"] = loc
+    schools = [raw.get("educations_details")] + [e.get("title") for e in (raw.get("education") or [])]
+    p["schools"] = list(dict.fromkeys(s for s in schools if s))
+    # Ids of the profiles LinkedIn shows next to this one; only those we have indexed are used
+    links = (raw.get("similar_profiles") or []) + (raw.get("people_also_viewed") or [])
+    urls = (l.get("url") or l.get("profile_link") or "" for l in links if isinstance(l, dict))
+    p["related"] = list(dict.fromkeys(m.group(1) for m in map(PROFILE_URL_RE.search, urls) if m))
+    return p
+
+def profile_to_text(profile):
+    parts = [f"{profile.get('name','')} — {profile.get('position','')}"]
+    if about:=profile.get("about"): parts.append(about)
+    curr = (profile.get("current_company") or {}).get("name")
+    if curr: parts.append(f"Current: {curr}")
+    exp = profile.get("experience") or []
+    ent = [f"{e['title']} at {e['company']}" for e in exp if e.get("title") and e.get("company")]
+    if ent: parts.append("Experience: " + "; ".join(ent))
+    return "\n\n".join(parts)
+
+def preprocess_profiles(raws, encoding):
+    """Slim records plus the precomputed profile_to_text output and its token count."""
+    return _add_text([slim_profile(raw) for raw in raws], encoding)
+
+def _add_text(profiles, encoding):
+    texts = [profile_to_text(p) for p in profiles]
+    for p, text, ids in zip(profiles, texts, encoding.encode_batch(texts)):
+        p["text"] = text
+        p["tokens"] = len(ids)
+        p["format"] = STORE_FORMAT
+    return profiles
+
+_worker_encoding = None
+
+def _init_worker(encoding):
+    global _worker_encoding
+    _worker_encoding = encoding
+
+def _add_text_shard(profiles):
+    return _add_text(profiles, _worker_encoding)
+
+def preprocess_many(raws, encoding, workers=1, serial_shards=4):
+    """preprocess_profiles over a stream of raw records, in order, SHARD_SIZE records per task.
+
+    With workers > 1, shards after the first serial_shards (small dumps aren't worth starting
+    processes for) go to a process pool. Records are slimmed here first so only the small
+    dicts are pickled, and the encoding is sent once per worker. Only a couple of shards per
+    worker are in flight, so the stream is never read ahead far.
+    """
+    raws = iter(raws)
+    shards = iter(lambda: list(islice(raws, SHARD_SIZE)), [])
+    for shard in islice(shards, None if workers <= 1 else serial_shards):
+        yield from preprocess_profiles(shard, encoding)
+    if workers <= 1:
+        return
+    # spawn, not fork: ingest calls this from a worker thread while its event loop runs
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(encoding,)) as pool:
+        pending = deque()
+        for shard in shards:
+            pending.append(pool.submit(_add_text_shard, [slim_profile(raw) for raw in shard]))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array one at a time without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = f.read(chunk_size)
+        eof = not data
+        buf = buf[pos:] + data
+        pos = 0
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip(" \t\r\n")
+    if pos >= len(buf) or buf[pos] != "[":
+        return
+    pos += 1
+    while True:
+        skip(" \t\r\n,")
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of JSON array")
+        if buf[pos] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if not eof and (end == len(buf) or buf[end] in ".eE"):
+            # A number cut off by the buffer edge ("12" read as "1", "2.5" as "2", "1e5" as "1") parses
+            # fine; read on to be sure. Nothing valid follows a complete value with ".", "e" or "E".
+            fill()
+            continue
+        yield obj
+        pos = end
+
+def iter_raw_dump(path):
+    with open(path, encoding="utf-8") as f:
+        for raw in iter_json_array(f):
+            if isinstance(raw, dict):
+                yield raw
+
+class ProfileStore:
+    """Compact JSONL store of preprocessed profiles, one line per unique id.
+
+    Reads go through an mmap of the file, so iterating it or merging into it never
+    materializes more than one stored record at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _lines(self):
+        if not self.exists() or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            while line := m.readline():
+                yield line
+
+    def __iter__(self):
+        for line in self._lines():
+            yield json.loads(line)
+
+    def count(self):
+        """Number of stored profiles, counted without parsing them."""
+        if not self.exists():
+            return 0
+        with open(self.path, "rb") as f:
+            return sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b""))
+
+    def _tmp(self, suffix):
+        # Unique per writer, so two merges never write the same side file
+        return f"{self.path}.{os.getpid()}.{threading.get_ident()}{suffix}"
+
+    @contextlib.contextmanager
+    def _locked(self):
+        # ingest.py --watch and scrape_person.py can merge into the same store at once
+        with open(f"{self.path}.lock", "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield  # closing the file releases the lock
+
+    def merge(self, sources, encoding, drop=(), workers=1):
+        """Fold raw Bright Data records into the store.
+
+        sources is an iterable of (source name, raw records). Every record tagged with a merged
+        source or a name in `drop` is replaced, and a later record wins over an earlier one with
+        the same id. workers > 1 preprocesses across that many processes.
+
+        New records are spooled to a side file first; then the surviving stored lines are copied
+        straight from the mmap and the spool appended, so only ids are held in memory. That second
+        step holds a lock on the store, so concurrent merges apply one after the other.
+        """
+        sources = list(sources)
+        replaced = {name for name, _ in sources} | set(drop)
+
+        def with_id(raws):
+            for raw in raws:
+                if raw.get("id"):
+                    yield raw
+                else:
+                    print(f"Skipping profile without ID: {raw.get('name', 'Unknown')}")
+
+        spool = self._tmp(".new")
+        latest = {}  # id -> spool line of its last record, which is the one kept
+        try:
+            start, n = time.perf_counter(), 0
+            with open(spool, "w", encoding="utf-8") as f:
+                for name, raws in sources:
+                    for p in preprocess_many(with_id(raws), encoding, workers):
+                        p["source"] = name
+                        latest[p["id"]] = n
+                        f.write(json.dumps(p, ensure_ascii=False, separators=(",", ":")) + "\n")
+                        n += 1
+            if n:
+                elapsed = time.perf_counter() - start
+                print(f"Preprocessed {n} profiles in {elapsed:.1f}s ({n / elapsed:.0f}/s, {workers} workers)")
+            with self._locked():
+                tmp = self._tmp(".tmp")
+                try:
+                    kept = 0
+                    with open(tmp, "wb") as out:
+                        for line in self._lines():
+                            p = json.loads(line)
+                            if p.get("source") not in replaced and p["id"] not in latest:
+                                out.write(line if line.endswith(b"\n") else line + b"\n")
+                                kept += 1
+                        last = set(latest.values())
+                        with open(spool, "rb") as f:
+                            for i, line in enumerate(f):
+                                if i in last:
+                                    out.write(line)
+                    os.replace(tmp, self.path)
+                finally:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+        finally:
+            os.remove(spool)
+        total = kept + len(latest)
+        print(f"Profile store {self.path}: {total} profiles")
+        return total
+
+def raw_dumps(profiles_dir):
+    return sorted(glob.glob(os.path.join(profiles_dir, RAW_PATTERN)), key=os.path.getmtime)
+
+def refresh_store(profiles_dir, encoding, progress=None, workers=1):
+    """Bring the compact store in line with the raw dumps in profiles_dir, and return it.
+
+    Only dumps newer than the store (or not in it yet) are parsed; profiles from dumps that were deleted are dropped.
+    Records merged from elsewhere (e.g. straight from the scraper) are left alone.
+    """
+    store = ProfileStore(os.path.join(profiles_dir, STORE_NAME))
+    since = os.path.getmtime(store.path) if store.exists() else 0
+    dumps = raw_dumps(profiles_dir)
+    known, outdated = set(), False
+    for p in store:
+        known.add(p.get("source"))
+        outdated = outdated or (p.get("format") != STORE_FORMAT and fnmatch(p.get("source") or "", RAW_PATTERN))
+    fresh = [path for path in dumps if os.path.getmtime(path) > since or os.path.basename(path) not in known]
+    present = {os.path.basename(path) for path in dumps}
+    gone = {name for name in known if name and fnmatch(name, RAW_PATTERN)} - present
+    if gone or outdated:
+        # A deleted dump may have shadowed the same ids in another dump, and an outdated store
+        # lacks fields, so re-read them all
+        fresh = dumps
+    print(f"Found {len(fresh)} new or updated JSON files to process")
+    if progress:
+        progress.files_total = len(fresh)
+
+    def read(path):
+        print(f"Processing file: {path}")
+        yield from iter_raw_dump(path)
+        if progress:
+            progress.files_processed += 1
+
+    if fresh or gone or not store.exists():
+        store.merge(((os.path.basename(path), read(path)) for path in fresh), encoding, drop=gone, workers=workers)
+    return store
+
+if __name__ == "__main__":
+    import tiktoken
+    parser = argparse.ArgumentParser(description="Build the compact profile store from raw Bright Data dumps")
+    parser.add_argument("profiles_dir", nargs="?", default=os.getenv("PROFILES_DIR", "../linkedin_profiles_prod"))
+    parser.add_argument("--model", default="text-embedding-ada-002", help="model whose tokenizer counts tokens")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="preprocessing processes")
+    args = parser.parse_args()
+    store = ProfileStore(os.path.join(args.profiles_dir, STORE_NAME))
+    store.merge(((os.path.basename(path), iter_raw_dump(path)) for path in raw_dumps(args.profiles_dir)),
+                tiktoken.encoding_for_model(args.model), workers=args.workers)
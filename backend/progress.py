@@ -0,0 +1,112 @@
+import json
+import os
+import time
+
+class IngestProgress:
+    """Counters for an ingest run, mirrored to a JSON file that /api/ingest/status reads."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.state = "idle"
+        self.collection = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.files_total = 0
+        self.files_processed = 0
+        self.profiles_total = 0        # records in the profile store, known once it is refreshed
+        self.profiles_scanned = 0
+        self.scan_done = False         # every stored profile has been read, so chunks_total is exact
+        self.profiles_changed = 0
+        self.chunks_queued = 0         # chunks of new/changed profiles handed to the embed stage so far
+        self.chunks_embedded = 0
+        self.chunks_upserted = 0
+        self.chunks_built = 0          # chunk texts produced from the store, changed or not
+        self.chunking_seconds = 0.0    # time from raw dumps to built chunks (store refresh included)
+        self.index_version = None
+
+    def start(self):
+        previous = self.load(self.path).get("index_version") if self.path else None
+        self.__init__(self.path)
+        self.index_version = previous
+        self.state = "running"
+        self.started_at = time.time()
+        self.save()
+
+    def finish(self, error=None):
+        self.state = "failed" if error else "done"
+        self.error = str(error) if error else None
+        self.finished_at = time.time()
+        self.save()
+
+    def chunks_total(self):
+        """Chunks this run will upsert: exact once every profile has been scanned, until then
+        extrapolated from the changed chunks per profile scanned so far (None before the first)."""
+        if self.scan_done:
+            return self.chunks_queued
+        if not self.profiles_scanned:
+            return None
+        return round(self.chunks_queued * max(self.profiles_total, self.profiles_scanned) / self.profiles_scanned)
+
+    def bump_index_version(self):
+        """Mark the searchable index as changed so API result caches drop what they hold."""
+        self.index_version = str(time.time_ns())
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def load(path):
+        """Read the last snapshot written by an ingest process, if any."""
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"state": "idle"}
+
+    def snapshot(self):
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        rate = self.chunks_upserted / elapsed if elapsed > 0 else 0.0
+        chunks_total = self.chunks_total()
+        eta = None
+        if self.state == "running" and rate > 0 and chunks_total is not None:
+            eta = max(chunks_total - self.chunks_upserted, 0) / rate
+        return {
+            "state": self.state,
+            "collection": self.collection,
+            "error": self.error,
+            "files_total": self.files_total,
+            "files_processed": self.files_processed,
+            "profiles_total": self.profiles_total,
+            "profiles_scanned": self.profiles_scanned,
+            "profiles_changed": self.profiles_changed,
+            "chunks_total": chunks_total,
+            "chunks_total_exact": self.scan_done,
+            "chunks_queued": self.chunks_queued,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_upserted": self.chunks_upserted,
+            "elapsed_seconds": round(elapsed, 2),
+            "chunks_per_second": round(rate, 2),
+            "chunking_chunks_per_second": round(self.chunks_built / self.chunking_seconds, 2)
+                                          if self.chunking_seconds else 0.0,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "index_version": self.index_version,
+        }
+
+_version_cache = {}
+
+def read_index_version(path):
+    """index_version from the status file, re-read only when the file changes."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _version_cache.get(path, (None,))[0] != mtime:
+        _version_cache[path] = (mtime, IngestProgress.load(path).get("index_version"))
+    return _version_cache[path][1]
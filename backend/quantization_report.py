@@ -0,0 +1,115 @@
+"""Recall vs. memory of each vector storage option, against the exact float32 baseline.
+
+    python quantization_report.py                       # vectors of the live collection
+    python quantization_report.py --synthetic 50000     # clustered random vectors, no index needed
+    python quantization_report.py --dims 256 512 1024 --json report.json
+
+Queries are stored vectors plus a little noise, with the query's own point left out of every
+ranking. Each configuration is scored by recall@k: the share of the exact top-k it returns.
+--dims truncates and renormalizes the vectors, which is what the `dimensions` parameter does for
+text-embedding-3-* models; for text-embedding-ada-002 those rows only show how much is lost.
+"""
+import argparse
+import json
+import time
+import numpy as np
+from vector_store import QUANTIZATIONS, approx_scores, quantize
+
+def load_vectors(limit):
+    from config import COLLECTION_NAME, VECTOR_STORE, qdrant, store
+    if VECTOR_STORE == "numpy":
+        return np.asarray(store._collection(COLLECTION_NAME).data[2][:limit])
+    vectors, offset = [], None
+    while len(vectors) < limit:
+        points, offset = qdrant.scroll(collection_name=COLLECTION_NAME, limit=min(1000, limit - len(vectors)),
+                                       offset=offset, with_payload=False, with_vectors=True)
+        vectors += [p.vector for p in points]
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+def synthetic_vectors(n, dim, clusters=200, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    return centers[rng.integers(clusters, size=n)] + rng.normal(scale=0.6, size=(n, dim)).astype(np.float32)
+
+def normalize(m):
+    return m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+
+def top_k(scores, k, exclude):
+    scores[exclude] = -np.inf
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def evaluate(matrix, queries, query_rows, k, kind, rescore, oversampling, baseline):
+    """Mean recall@k and query time of one configuration."""
+    codes = quantize(matrix, kind) if kind != "none" else None
+    recalls, elapsed = [], 0.0
+    for q, row, truth in zip(queries, query_rows, baseline):
+        start = time.perf_counter()
+        if codes is None:
+            found = top_k(matrix @ q, k, row)
+        else:
+            approx = approx_scores(codes[0], kind, q, codes[1])
+            if rescore:
+                candidates = top_k(approx, int(k * oversampling), row)
+                found = candidates[np.argsort(-(matrix[candidates] @ q))][:k]
+            else:
+                found = top_k(approx, k, row)
+        elapsed += time.perf_counter() - start
+        recalls.append(len(set(found) & set(truth)) / k)
+    ram = codes[0].nbytes if codes is not None else matrix.nbytes
+    return {
+        "recall": round(float(np.mean(recalls)), 4),
+        "ram_mb": round(ram / 2**20, 2),
+        "bytes_per_vector": ram // len(matrix),
+        "on_disk_mb": round(matrix.nbytes / 2**20, 2) if codes is not None and rescore else 0.0,
+        "query_ms": round(1000 * elapsed / len(queries), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs. memory of the vector quantization options")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of the index")
+    parser.add_argument("--dim", type=int, default=1536, help="dimension of the synthetic vectors")
+    parser.add_argument("--limit", type=int, default=100000, help="most vectors to read from the index")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[2.0, 4.0])
+    parser.add_argument("--dims", type=int, nargs="*", default=[], help="also try vectors shortened to these sizes")
+    parser.add_argument("--json", help="write the report here as well")
+    args = parser.parse_args()
+
+    matrix = synthetic_vectors(args.synthetic, args.dim) if args.synthetic else load_vectors(args.limit)
+    matrix = normalize(matrix.astype(np.float32))
+    n, dim = matrix.shape
+    if n <= args.k:
+        raise SystemExit(f"Need more than {args.k} vectors, found {n}")
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(n, size=min(args.queries, n), replace=False)
+    queries = normalize(matrix[query_rows] + rng.normal(scale=0.02, size=(len(query_rows), dim)).astype(np.float32))
+    baseline = [top_k(matrix @ q, args.k, row) for q, row in zip(queries, query_rows)]
+    print(f"{n} vectors x {dim} dims, {len(queries)} queries, recall@{args.k} vs. exact float32")
+
+    configs = [("none", dim, False, None)]
+    for kind in QUANTIZATIONS[1:]:
+        configs.append((kind, dim, False, None))
+        configs += [(kind, dim, True, o) for o in args.oversampling]
+    configs += [("none", d, False, None) for d in args.dims if d < dim]
+
+    rows = []
+    for kind, d, rescore, oversampling in configs:
+        m, qs = (matrix, queries) if d == dim else (normalize(matrix[:, :d]), normalize(queries[:, :d]))
+        result = evaluate(m, qs, query_rows, args.k, kind, rescore, oversampling, baseline)
+        rows.append({"quantization": kind, "dims": d, "rescore": rescore, "oversampling": oversampling, **result})
+
+    print(f"{'quantization':<13}{'dims':>6}{'rescore':>9}{'recall':>9}{'RAM MB':>10}{'B/vec':>8}{'disk MB':>9}{'ms/query':>10}")
+    for r in rows:
+        rescore = f"x{r['oversampling']:g}" if r["rescore"] else "-"
+        print(f"{r['quantization']:<13}{r['dims']:>6}{rescore:>9}{r['recall']:>9.3f}{r['ram_mb']:>10.2f}"
+              f"{r['bytes_per_vector']:>8}{r['on_disk_mb']:>9.2f}{r['query_ms']:>10.3f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"vectors": n, "dim": dim, "k": args.k, "queries": len(queries), "configs": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Precomputed "similar alumni" graph: each profile's nearest profiles, ready for a dictionary lookup.
+
+A profile's vector is the normalized mean of its chunk vectors. ingest.py hands over the vectors of
+new and changed profiles after each run, and update() only recomputes what that can affect:
+- the neighbor lists of changed profiles (against every profile, in blocks of matrix products);
+- lists that pointed at a changed or removed profile;
+- a cheap check of whether a changed profile now beats the k-th neighbor of every other profile.
+The vector neighbors are then blended with Bright Data's similar_profiles / people_also_viewed
+links (where they point at a profile we have) by adding LINK_BOOST to their cosine similarity.
+
+State lives in two files: <path> (JSON: neighbor lists, links and a card for each profile, its
+first chunk's payload with the text cut short, all the API reads) and <path>.npz (profile ids and vectors, which
+only ingest needs).
+"""
+import json
+import os
+import threading
+import numpy as np
+
+BLOCK = 1024  # profiles per matrix product when recomputing neighbor lists
+CARD_TEXT_CHARS = 300  # of the profile text kept per card: the name/title line and the start of the bio
+
+def card(payload):
+    """What a result card needs from a chunk payload: every field, but only the start of the text."""
+    c = {k: v for k, v in payload.items() if k != "text"}
+    text = payload.get("text") or ""
+    c["text"] = text if len(text) <= CARD_TEXT_CHARS else text[:CARD_TEXT_CHARS - 1].rsplit(" ", 1)[0] + "…"
+    return c
+
+class SimilarityGraph:
+    def __init__(self, path, k=20, link_boost=0.1):
+        self.path = path
+        self.k = k
+        self.link_boost = link_boost
+        self.ids = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.knn = {}      # profile_id -> [(profile_id, cosine)], vector neighbors only
+        self.links = {}    # profile_id -> [profile_id], scraped links to indexed profiles
+        self.similar = {}  # profile_id -> [(profile_id, score)], what the API serves
+        self.cards = {}    # profile_id -> card(payload of its first chunk)
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.similar)
+
+    def __contains__(self, profile_id):
+        return profile_id in self.similar
+
+    # — Persistence —
+    def load(self, with_vectors=False):
+        """Read the graph (and, for ingest, the vectors) if it exists."""
+        if not os.path.exists(self.path) or (with_vectors and not os.path.exists(f"{self.path}.npz")):
+            return self
+        with open(self.path) as f:
+            data = json.load(f)
+        self.knn = {pid: [tuple(n) for n in nbrs] for pid, nbrs in data["knn"].items()}
+        self.links = data["links"]
+        self.similar = {pid: [tuple(n) for n in nbrs] for pid, nbrs in data["similar"].items()}
+        self.cards = {pid: card(c) for pid, c in data["cards"].items()}  # older graphs kept the full text
+        if with_vectors and os.path.exists(f"{self.path}.npz"):
+            with np.load(f"{self.path}.npz") as npz:
+                self.ids = npz["ids"].tolist()
+                self.vectors = npz["vectors"]
+        return self
+
+    def reload_if_changed(self):
+        """Pick up a graph rewritten by ingest.py; cheap enough to call on every request."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self.load()
+                    self._mtime = mtime
+
+    def save(self):
+        with open(f"{self.path}.tmp.npz", "wb") as f:
+            np.savez(f, ids=np.array(self.ids, dtype=str), vectors=self.vectors)
+        os.replace(f"{self.path}.tmp.npz", f"{self.path}.npz")
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump({"knn": self.knn, "links": self.links, "similar": self.similar, "cards": self.cards}, f,
+                      separators=(",", ":"))
+        os.replace(f"{self.path}.tmp", self.path)
+
+    # — Lookups —
+    def neighbors(self, profile_id, limit=None):
+        """[(profile_id, score)] most similar first, or None for an unknown profile."""
+        nbrs = self.similar.get(profile_id)
+        return nbrs[:limit] if nbrs is not None else None
+
+    # — Updates —
+    def update(self, vectors, cards, links, keep):
+        """Fold in a sync: vectors and cards of new/changed profiles, scraped links of every profile,
+        and the ids still in the index (anything else is removed). Returns the number of neighbor
+        lists rewritten.
+        """
+        keep = set(keep)
+        removed = {pid for pid in self.ids if pid not in keep}
+        changed = {pid for pid in vectors if pid in keep}
+        moved = removed | changed
+        old = {pid: i for i, pid in enumerate(self.ids)}
+
+        kept_ids = [pid for pid in self.ids if pid not in moved]
+        new_ids = sorted(changed)
+        rows = [self.vectors[[old[pid] for pid in kept_ids]]] if kept_ids else []
+        if new_ids:
+            m = np.asarray([vectors[pid] for pid in new_ids], dtype=np.float32)
+            rows.append(m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12))
+        self.ids = kept_ids + new_ids
+        self.vectors = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        index = {pid: i for i, pid in enumerate(self.ids)}
+
+        for pid in removed | changed:
+            self.knn.pop(pid, None)
+        for pid in removed:
+            self.similar.pop(pid, None)
+            self.cards.pop(pid, None)
+        self.cards.update((pid, cards[pid]) for pid in changed)
+        # Lists that pointed at a profile that moved or went away are recomputed from scratch
+        stale = {pid for pid, nbrs in self.knn.items() if any(n in moved for n, _ in nbrs)}
+        recompute = sorted(changed | stale)
+        self._recompute(recompute, index)
+        touched = set(recompute)
+        # Everyone else only has to check whether a changed profile now beats their k-th neighbor
+        rest = [pid for pid in self.ids if pid not in touched]
+        if new_ids and rest:
+            touched |= self._admit(rest, new_ids, index)
+
+        resolved = {}
+        for pid in keep:
+            if pid in index:
+                targets = [t for t in dict.fromkeys(links.get(pid) or []) if t in index and t != pid]
+                if targets:
+                    resolved[pid] = targets
+        for pid in set(resolved) | set(self.links):
+            if resolved.get(pid) != self.links.get(pid) or any(t in moved for t in resolved.get(pid, [])):
+                touched.add(pid)
+        self.links = resolved
+        for pid in touched:
+            if pid in index:
+                self.similar[pid] = self._blend(pid, index)
+        return len(touched)
+
+    def _recompute(self, pids, index):
+        n = len(self.ids)
+        k = min(self.k, n - 1)
+        if k <= 0:
+            for pid in pids:
+                self.knn[pid] = []
+            return
+        for start in range(0, len(pids), BLOCK):
+            block = pids[start:start + BLOCK]
+            rows = np.array([index[pid] for pid in block])
+            scores = self.vectors[rows] @ self.vectors.T
+            scores[np.arange(len(rows)), rows] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+            for pid, idx, s in zip(block, top.tolist(), top_scores.tolist()):
+                self.knn[pid] = [(self.ids[i], round(v, 4)) for i, v in zip(idx, s)]
+
+    def _admit(self, pids, new_ids, index):
+        """Merge the new profiles into the lists of `pids` where they score above the k-th neighbor."""
+        touched = set()
+        new_rows = self.vectors[[index[pid] for pid in new_ids]]
+        for start in range(0, len(pids), BLOCK):
+            block = pids[start:start + BLOCK]
+            scores = self.vectors[[index[pid] for pid in block]] @ new_rows.T
+            floor = np.array([self.knn[pid][-1][1] if len(self.knn.get(pid, [])) >= self.k else -np.inf
+                              for pid in block])
+            for r, c in zip(*np.nonzero(scores > floor[:, None])):
+                pid = block[r]
+                nbrs = self.knn.setdefault(pid, [])
+                nbrs.append((new_ids[c], round(float(scores[r, c]), 4)))
+                touched.add(pid)
+            for pid in touched.intersection(block):
+                self.knn[pid] = sorted(self.knn[pid], key=lambda x: -x[1])[:self.k]
+        return touched
+
+    def _blend(self, pid, index):
+        scores = dict(self.knn.get(pid, []))
+        for target in self.links.get(pid, []):
+            cosine = scores.get(target)
+            if cosine is None:
+                cosine = float(self.vectors[index[pid]] @ self.vectors[index[target]])
+            scores[target] = round(cosine + self.link_boost, 4)
+        return sorted(scores.items(), key=lambda x: -x[1])[:self.k]
+
+    def stats(self):
+        return {"profiles": len(self.similar), "k": self.k, "linked_profiles": len(self.links)}
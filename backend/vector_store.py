@@ -0,0 +1,518 @@
+"""Vector store backends used by app.py and ingest.py.
+
+Both expose the same small surface (collections, an alias, upsert/delete/search/scroll/count),
+plus async acount/asearch/asearch_groups/afacets/ascroll for the API's request path, and payloads()
+to walk every point's payload. search_groups returns the best-scoring chunk of each of the top
+`limit` distinct values of a payload field (a profile). Searches take optional `filters`,
+{payload field: [values]}: a point matches when every field holds one of its values (list fields
+match if any element does).
+
+- QdrantStore wraps the Qdrant server (the default).
+- NumpyStore keeps each collection in-process as a memory-mapped, row-normalized float32 matrix
+  with parallel id/payload arrays, and answers top-k cosine queries with one matrix-vector product.
+
+Both can quantize: "scalar" keeps an int8 copy of the vectors in RAM (4x smaller), "binary" one
+bit per dimension (32x smaller). Candidates are ranked on the compressed copy and, with rescore,
+the best `oversampling` x limit of them are re-ranked with the original float32 vectors, which
+stay on disk (a memmap for NumpyStore, on_disk=True for Qdrant).
+"""
+import asyncio
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import Counter, namedtuple
+import numpy as np
+from qdrant_client.models import (
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    FieldCondition,
+    Filter,
+    MatchAny,
+    PointIdsList,
+    PointStruct,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+)
+
+Hit = namedtuple("Hit", ["id", "score", "payload"])
+QUANTIZATIONS = ("none", "scalar", "binary")
+SCALAR_QUANTILE = 0.99  # int8 range covers this quantile of |component|; outliers are clipped
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def quantize(matrix, kind, block=65536):
+    """Compressed copy of a row-normalized float32 matrix: (codes, scale). Reads it block by block."""
+    if kind == "scalar":
+        sample = np.abs(np.asarray(matrix[:block]))
+        scale = float(np.quantile(sample, SCALAR_QUANTILE)) if sample.size else 1.0
+        scale = scale or 1.0
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        for i in range(0, len(matrix), block):
+            codes[i:i + block] = np.clip(np.rint(np.asarray(matrix[i:i + block]) * (127 / scale)), -127, 127)
+        return codes, scale
+    if kind == "binary":
+        codes = np.empty((len(matrix), (matrix.shape[1] + 7) // 8), dtype=np.uint8)
+        for i in range(0, len(matrix), block):
+            codes[i:i + block] = np.packbits(np.asarray(matrix[i:i + block]) > 0, axis=1)
+        return codes, 1.0
+    raise ValueError(f"Unknown quantization: {kind}")
+
+def approx_scores(codes, kind, q, scale, block=8192):
+    """Scores of a normalized query against quantized rows; they rank like cosine, only less exactly."""
+    out = np.empty(len(codes), dtype=np.float32)
+    if kind == "scalar":
+        qs = q * (scale / 127)
+        for i in range(0, len(codes), block):
+            out[i:i + block] = codes[i:i + block].astype(np.float32) @ qs
+    else:
+        qb = np.packbits(q > 0)
+        dim = len(q)
+        for i in range(0, len(codes), block):
+            hamming = _POPCOUNT[np.bitwise_xor(codes[i:i + block], qb)].sum(axis=1, dtype=np.int32)
+            out[i:i + block] = 1 - 2 * hamming / dim
+    return out
+
+def _qdrant_filter(filters):
+    if not filters:
+        return None
+    return Filter(must=[FieldCondition(key=field, match=MatchAny(any=list(values))) for field, values in filters.items()])
+
+class QdrantStore:
+    def __init__(self, client, dim, aclient=None, quantization="none", on_disk=False, rescore=True, oversampling=2.0):
+        self.client = client
+        self.aclient = aclient
+        self.dim = dim
+        self.quantization = quantization
+        self.on_disk = on_disk
+        self.search_params = None
+        if quantization != "none":
+            self.search_params = SearchParams(
+                quantization=QuantizationSearchParams(rescore=rescore, oversampling=oversampling))
+
+    def create_collection(self, name):
+        quantization_config = None
+        if self.quantization == "scalar":
+            quantization_config = ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=SCALAR_QUANTILE, always_ram=True))
+        elif self.quantization == "binary":
+            quantization_config = BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config=VectorParams(size=self.dim, distance=Distance.COSINE, on_disk=self.on_disk),
+            quantization_config=quantization_config,
+        )
+
+    def create_keyword_indexes(self, name, fields):
+        for field in fields:
+            self.client.create_payload_index(collection_name=name, field_name=field, field_schema="keyword")
+
+    def delete_collection(self, name):
+        self.client.delete_collection(name)
+
+    def collection_exists(self, name):
+        return self.client.collection_exists(name)
+
+    def alias_target(self, alias):
+        for a in self.client.get_aliases().aliases:
+            if a.alias_name == alias:
+                return a.collection_name
+        return None
+
+    def switch_alias(self, alias, collection):
+        """Atomically repoint alias at collection. Returns the previous target."""
+        old = self.alias_target(alias)
+        if old is None and self.client.collection_exists(alias):
+            # Pre-alias deployments had a real collection under the alias name; it has to go first
+            print(f"Dropping legacy collection {alias} to make room for the alias")
+            self.client.delete_collection(alias)
+        ops = []
+        if old:
+            ops.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+        ops.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=collection, alias_name=alias)))
+        self.client.update_collection_aliases(change_aliases_operations=ops)
+        return old
+
+    def count(self, name, exact=True):
+        return self.client.count(collection_name=name, exact=exact).count
+
+    def upsert(self, name, points):
+        """points: iterable of (id, vector, payload)."""
+        self.client.upsert(
+            collection_name=name,
+            points=[PointStruct(id=pid, vector=vec, payload=payload) for pid, vec, payload in points],
+        )
+
+    def delete(self, name, ids):
+        self.client.delete(collection_name=name, points_selector=PointIdsList(points=list(ids)))
+
+    def flush(self, name):
+        pass
+
+    def search(self, name, vector, limit, filters=None):
+        return self.client.query_points(collection_name=name, query=vector, limit=limit,
+                                        query_filter=_qdrant_filter(filters), search_params=self.search_params,
+                                        with_payload=True).points
+
+    def search_groups(self, name, vector, limit, group_by, filters=None):
+        res = self.client.query_points_groups(collection_name=name, query=vector, group_by=group_by, limit=limit,
+                                              query_filter=_qdrant_filter(filters), search_params=self.search_params,
+                                              group_size=1, with_payload=True)
+        return [g.hits[0] for g in res.groups]
+
+    def payloads(self, name, batch=1000):
+        offset = None
+        while True:
+            points, offset = self.client.scroll(collection_name=name, limit=batch, offset=offset,
+                                                with_payload=True, with_vectors=False)
+            for point in points:
+                yield point.payload
+            if offset is None:
+                return
+
+    def facets(self, name, field, limit):
+        return [h.value for h in self.client.facet(collection_name=name, key=field, limit=limit).hits]
+
+    def scroll(self, name, limit):
+        return [h.payload for h in self.client.scroll(collection_name=name, limit=limit, with_payload=True)[0]]
+
+    # Without an async client (in-memory Qdrant) the async variants run the sync calls off the loop
+    async def acount(self, name, exact=True):
+        if self.aclient is None:
+            return await asyncio.to_thread(self.count, name, exact)
+        return (await self.aclient.count(collection_name=name, exact=exact)).count
+
+    async def asearch(self, name, vector, limit, filters=None):
+        if self.aclient is None:
+            return await asyncio.to_thread(self.search, name, vector, limit, filters)
+        return (await self.aclient.query_points(collection_name=name, query=vector, limit=limit,
+                                                query_filter=_qdrant_filter(filters),
+                                                search_params=self.search_params, with_payload=True)).points
+
+    async def asearch_groups(self, name, vector, limit, group_by, filters=None):
+        if self.aclient is None:
+            return await asyncio.to_thread(self.search_groups, name, vector, limit, group_by, filters)
+        res = await self.aclient.query_points_groups(collection_name=name, query=vector, group_by=group_by,
+                                                     limit=limit, query_filter=_qdrant_filter(filters),
+                                                     search_params=self.search_params, group_size=1,
+                                                     with_payload=True)
+        return [g.hits[0] for g in res.groups]
+
+    async def afacets(self, name, field, limit):
+        if self.aclient is None:
+            return await asyncio.to_thread(self.facets, name, field, limit)
+        return [h.value for h in (await self.aclient.facet(collection_name=name, key=field, limit=limit)).hits]
+
+    async def ascroll(self, name, limit):
+        if self.aclient is None:
+            return await asyncio.to_thread(self.scroll, name, limit)
+        return [h.payload for h in (await self.aclient.scroll(collection_name=name, limit=limit, with_payload=True))[0]]
+
+class _NumpyCollection:
+    """One collection on disk: meta.json (ids, payloads, vectors file name) + vectors-<gen>.f32."""
+
+    def __init__(self, path, dim, quantization="none", rescore=True, oversampling=2.0):
+        self.path = path
+        self.dim = dim
+        self.quantization = quantization
+        self.rescore = rescore
+        self.oversampling = oversampling
+        # (ids, payloads, matrix, codes) swapped as one reference so concurrent searches see a consistent
+        # view; codes is the quantized (codes, scale) copy held in RAM, or None
+        self.data = ([], [], np.empty((0, dim), dtype=np.float32), None)
+        self.mtime = None
+        self.pending = {}
+        self.deleted = set()
+        self._keyword_index = (None, {})  # (data it was built from, {field: {value: [rows]}})
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.path, "meta.json")
+
+    def load(self):
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self.mtime:
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        ids, payloads = meta["ids"], meta["payloads"]
+        codes = None
+        if ids:
+            matrix = np.memmap(os.path.join(self.path, meta["vectors_file"]), dtype=np.float32,
+                               mode="r", shape=(len(ids), self.dim))
+            if self.quantization != "none":
+                codes = quantize(matrix, self.quantization)
+        else:
+            matrix = np.empty((0, self.dim), dtype=np.float32)
+        self.data, self.mtime = (ids, payloads, matrix, codes), mtime
+
+    def flush(self):
+        """Apply pending upserts/deletes and write a new generation of the files."""
+        if not self.pending and not self.deleted:
+            return
+        old_ids, old_payloads, old_matrix, _ = self.data
+        drop = self.deleted | set(self.pending)
+        keep = [i for i, pid in enumerate(old_ids) if pid not in drop]
+        ids = [old_ids[i] for i in keep] + list(self.pending)
+        payloads = [old_payloads[i] for i in keep] + [p for _, p in self.pending.values()]
+        new = np.asarray([v for v, _ in self.pending.values()], dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(new, axis=1, keepdims=True)
+        new /= np.where(norms == 0, 1, norms)
+        matrix = np.concatenate([np.asarray(old_matrix[keep]), new]) if keep else new
+
+        os.makedirs(self.path, exist_ok=True)
+        old_file = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                old_file = json.load(f)["vectors_file"]
+        vectors_file = f"vectors-{uuid.uuid4().hex}.f32"
+        matrix.astype(np.float32).tofile(os.path.join(self.path, vectors_file))
+        tmp = f"{self.meta_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "vectors_file": vectors_file, "ids": ids, "payloads": payloads}, f)
+        # Readers switch generations atomically on meta.json; open memmaps keep the old file alive
+        os.replace(tmp, self.meta_path)
+        if old_file:
+            os.remove(os.path.join(self.path, old_file))
+        self.pending, self.deleted, self.mtime = {}, set(), None
+        self.load()
+
+    def _value_rows(self, data, field):
+        """Inverted index value -> rows for one payload field, built on first use per generation."""
+        built_for, index = self._keyword_index
+        if built_for is not data:
+            built_for, index = data, {}
+            self._keyword_index = (data, index)
+        if field not in index:
+            rows = {}
+            for i, payload in enumerate(data[1]):
+                values = payload.get(field)
+                for v in values if isinstance(values, list) else [values]:
+                    if v is not None:
+                        rows.setdefault(v, []).append(i)
+            index[field] = rows
+        return index[field]
+
+    def _scores(self, vector, filters, pool):
+        """Candidate rows and their cosine scores: every row, or only those matching the filters.
+
+        With quantization the rows are ranked on the compressed copy; with rescore only the best
+        pool * oversampling of them are kept and scored exactly from the on-disk vectors. Returns
+        (data, rows, scores, complete), complete being False if candidates were cut off.
+        """
+        data = self.data
+        ids, payloads, matrix, codes = data
+        q = np.asarray(vector, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        rows = None
+        for field, values in (filters or {}).items():
+            index = self._value_rows(data, field)
+            match = set().union(*(index.get(v, ()) for v in values))
+            rows = match if rows is None else rows & match
+        if rows is not None:
+            rows = np.fromiter(sorted(rows), dtype=np.int64)
+            if not len(rows):
+                return data, rows, np.empty(0, dtype=np.float32), True
+        if codes is None:
+            if rows is None:
+                return data, np.arange(len(ids)), matrix @ q, True
+            return data, rows, matrix[rows] @ q, True
+        approx = approx_scores(codes[0] if rows is None else codes[0][rows], self.quantization, q, codes[1])
+        if rows is None:
+            rows = np.arange(len(ids))
+        m = int(pool * self.oversampling)
+        if not self.rescore or m >= len(rows):
+            if self.rescore:
+                return data, rows, np.asarray(matrix[rows]) @ q, True
+            return data, rows, approx, True
+        keep = np.sort(rows[np.argpartition(-approx, m - 1)[:m]])  # sorted rows read the memmap in order
+        return data, keep, np.asarray(matrix[keep]) @ q, False
+
+    def search(self, vector, limit, filters=None):
+        (ids, payloads, _, _), rows, scores, _ = self._scores(vector, filters, limit)
+        n = len(rows)
+        if n == 0:
+            return []
+        k = min(limit, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [Hit(ids[rows[i]], float(scores[i]), payloads[rows[i]]) for i in top]
+
+    def search_groups(self, vector, limit, group_by, filters=None):
+        pool = limit * 4
+        while True:
+            (ids, payloads, _, _), rows, scores, complete = self._scores(vector, filters, pool)
+            hits = self._top_groups(ids, payloads, rows, scores, limit, group_by)
+            if len(hits) == limit or complete:
+                return hits
+            pool *= 2
+
+    @staticmethod
+    def _top_groups(ids, payloads, rows, scores, limit, group_by):
+        n = len(rows)
+        if n == 0:
+            return []
+        # Over-fetch chunks and widen the window until it holds `limit` distinct groups (or everything)
+        fetch = min(limit * 4, n)
+        while True:
+            top = np.argpartition(-scores, fetch - 1)[:fetch] if fetch < n else np.arange(n)
+            top = top[np.argsort(-scores[top])]
+            hits, seen = [], set()
+            for i in top:
+                row = rows[i]
+                key = payloads[row].get(group_by)
+                if key not in seen:
+                    seen.add(key)
+                    hits.append(Hit(ids[row], float(scores[i]), payloads[row]))
+                    if len(hits) == limit:
+                        return hits
+            if fetch == n:
+                return hits
+            fetch = min(fetch * 2, n)
+
+    def facets(self, field, limit):
+        counts = Counter({v: len(rows) for v, rows in self._value_rows(self.data, field).items()})
+        return [v for v, _ in counts.most_common(limit)]
+
+class NumpyStore:
+    def __init__(self, root, dim, quantization="none", rescore=True, oversampling=2.0):
+        self.root = root
+        self.dim = dim
+        self.quantization = quantization
+        self.rescore = rescore
+        self.oversampling = oversampling
+        self._collections = {}
+        self._targets = {}  # alias -> collection it pointed at when last resolved
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def _aliases_path(self):
+        return os.path.join(self.root, "aliases.json")
+
+    def _aliases(self):
+        try:
+            with open(self._aliases_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _collection(self, name):
+        aliases = self._aliases()
+        target = aliases.get(name, name)
+        with self._lock:
+            if name in aliases and self._targets.get(name) != target:
+                # The alias moved (ingest --rebuild): let go of collections no alias points at any
+                # more, unless they hold unflushed changes (a build in progress)
+                self._targets[name] = target
+                live = set(aliases.values())
+                for stale in [n for n, c in self._collections.items()
+                              if n not in live and not c.pending and not c.deleted]:
+                    del self._collections[stale]
+            coll = self._collections.get(target)
+            if coll is None:
+                coll = self._collections[target] = _NumpyCollection(os.path.join(self.root, target), self.dim,
+                                                                    self.quantization, self.rescore,
+                                                                    self.oversampling)
+            coll.load()
+        return coll
+
+    def create_collection(self, name):
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+
+    def delete_collection(self, name):
+        self._collections.pop(name, None)
+        shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def collection_exists(self, name):
+        return os.path.isdir(os.path.join(self.root, self._aliases().get(name, name)))
+
+    def alias_target(self, alias):
+        return self._aliases().get(alias)
+
+    def switch_alias(self, alias, collection):
+        aliases = self._aliases()
+        old = aliases.get(alias)
+        aliases[alias] = collection
+        tmp = f"{self._aliases_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(aliases, f)
+        os.replace(tmp, self._aliases_path)
+        return old
+
+    def count(self, name, exact=True):
+        if not self.collection_exists(name):
+            raise KeyError(f"Collection {name} not found")
+        return len(self._collection(name).data[0])
+
+    def upsert(self, name, points):
+        coll = self._collection(name)
+        for pid, vec, payload in points:
+            # float32 now: a 1536-d vector as a list of Python floats is ~50 KB until flush
+            coll.pending[pid] = (np.asarray(vec, dtype=np.float32), payload)
+            coll.deleted.discard(pid)
+
+    def delete(self, name, ids):
+        coll = self._collection(name)
+        for pid in ids:
+            coll.pending.pop(pid, None)
+            coll.deleted.add(pid)
+
+    def flush(self, name):
+        self._collection(name).flush()
+
+    def create_keyword_indexes(self, name, fields):
+        pass  # built in memory on first filtered search
+
+    def search(self, name, vector, limit, filters=None):
+        return self._collection(name).search(vector, limit, filters)
+
+    def search_groups(self, name, vector, limit, group_by, filters=None):
+        return self._collection(name).search_groups(vector, limit, group_by, filters)
+
+    def facets(self, name, field, limit):
+        return self._collection(name).facets(field, limit)
+
+    def payloads(self, name):
+        return iter(self._collection(name).data[1])
+
+    def scroll(self, name, limit):
+        return list(self._collection(name).data[1][:limit])
+
+    # In-process, so the async variants only move the work off the event loop
+    async def acount(self, name, exact=True):
+        return await asyncio.to_thread(self.count, name, exact)
+
+    async def asearch(self, name, vector, limit, filters=None):
+        return await asyncio.to_thread(self.search, name, vector, limit, filters)
+
+    async def asearch_groups(self, name, vector, limit, group_by, filters=None):
+        return await asyncio.to_thread(self.search_groups, name, vector, limit, group_by, filters)
+
+    async def afacets(self, name, field, limit):
+        return await asyncio.to_thread(self.facets, name, field, limit)
+
+    async def ascroll(self, name, limit):
+        return await asyncio.to_thread(self.scroll, name, limit)
+
+def make_store(kind, qdrant_client, root, dim, async_qdrant_client=None,
+               quantization="none", on_disk=False, rescore=True, oversampling=2.0):
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown VECTOR_QUANTIZATION: {quantization}")
+    if kind == "numpy":
+        return NumpyStore(root, dim, quantization, rescore, oversampling)
+    if kind == "qdrant":
+        return QdrantStore(qdrant_client, dim, async_qdrant_client, quantization, on_disk, rescore, oversampling)
+    raise ValueError(f"Unknown VECTOR_STORE: {kind}")
@@ -1,9 +1,6 @@
-import json
-import requests
 import streamlit as st
 import time
-
-API = "http://localhost:8000/api"
+import bearlink_client as api
 
 st.set_page_config(
     page_title="BearLink",
@@ -134,38 +131,71 @@ DEMO_PROFILES = [
     {"name": "Carol Christ",   "title": "Product Manager at Google", "bio": "Leads cross functional teams on mobile apps."},
 ]
 
-def backend_search(query: str):
-    resp = requests.post(f"{API}/search", json={"query": query})
-    resp.raise_for_status()
-    results = resp.json()
-    
-    seen_ids = set()
-    unique_results = []
-    for result in results:
-        profile_id = result.get('profile_id')
-        if profile_id and profile_id not in seen_ids:
-            seen_ids.add(profile_id)
-            unique_results.append(result)
-    
-    return unique_results
+PAGE_SIZE = 10  # cards rendered per page of results
 
-def backend_generate_email(profile, context, uploaded_file):
-    data = {
-        "profile": json.dumps(profile), 
-        "context": context
-    }
-    files = {}
-    if uploaded_file is not None:
-        files["file"] = (uploaded_file.name, uploaded_file.getvalue())
+@st.cache_data(max_entries=2000, show_spinner=False)
+def card_html(name, title, bio, url):
+    """The HTML of a profile card, built once per profile rather than on every rerun."""
+    parts = bio.split("\\n\\n")
+    clean_bio = "\n\n".join(parts[1:] if len(parts) > 1 else [])
+    return f"""
+                <div class="profile-card">
+                    <h3><a href="{url}" target="_blank" style="text-decoration:none; color:inherit;">{name}</a></h3>
+                    <em>{title}</em>
+                    <p>{clean_bio}</p>
+                </div>
+                """
 
-    resp = requests.post(f"{API}/email", data=data, files=files)
-    resp.raise_for_status()
-    return resp.json()["email"]
+def pick_key(prof):
+    return prof.get("profile_id") or prof["name"]
+
+def toggle_pick(prof):
+    # Picks live outside the checkboxes: a checkbox on another page is no longer rendered, and
+    # Streamlit drops the state of widgets that weren't rendered
+    key = pick_key(prof)
+    if st.session_state[f"pick_{key}"]:
+        st.session_state.picked[key] = prof
+    else:
+        st.session_state.picked.pop(key, None)
+
+def show_results(results, next_cursor=None, similar_to=None):
+    """Replace the results with a new list (a search or a similar-profiles lookup), back on page one."""
+    st.session_state.search_results = results
+    st.session_state.next_cursor = next_cursor
+    st.session_state.similar_to = similar_to
+    st.session_state.results_page = 0
+    st.session_state.picked = {}
+    # The checkboxes belonged to the previous list
+    for key in [k for k in st.session_state if k.startswith("pick_")]:
+        del st.session_state[key]
+
+def turn_page(step):
+    # Pages already loaded are kept in session state; the backend is only asked for the next page
+    # once the user reaches the end of what we have
+    start = (st.session_state.results_page + step) * PAGE_SIZE
+    if step > 0 and start + PAGE_SIZE > len(st.session_state.search_results) and st.session_state.next_cursor:
+        try:
+            more, st.session_state.next_cursor = api.search(
+                st.session_state.search_query, st.session_state.next_cursor, st.session_state.search_filters
+            )
+        except Exception as e:
+            st.error(f"Error during search: {str(e)}")
+            return
+        st.session_state.search_results = st.session_state.search_results + more
+    if 0 <= start < len(st.session_state.search_results):
+        st.session_state.results_page += step
 
 for key, default in [
     ("stage", "search"),
     ("search_results", []),
+    ("next_cursor", None),
+    ("search_filters", {}),
+    ("similar_to", None),
+    ("results_page", 0),
+    ("picked", {}),
     ("selected_profile", None),
+    ("batch_profiles", []),
+    ("batch_emails", []),
     ("compose_info", ""),
     ("uploaded_file", None),
     ("email_generated", ""),
@@ -185,11 +215,24 @@ if st.session_state.stage == "search":
         key="search_input",
         placeholder="'Haas MBA graduates', 'Berkeley research in AI', 'Department of Music alumni'"
     )
+    with st.expander("Filters"):
+        options = api.filters()
+        any_value = lambda v: v or "Any"
+        current_company = st.selectbox("Current company", [""] + options.get("current_company", []), format_func=any_value)
+        past_companies = st.multiselect("Worked at", options.get("experience_companies", []))
+        location = st.selectbox("Location", [""] + options.get("location", []), format_func=any_value)
+        school = st.selectbox("School", [""] + options.get("schools", []), format_func=any_value)
     col1, col2 = st.columns([1, 4])
     with col1:
         if st.button("Find Bears", use_container_width=True):
             if query.strip():
                 st.session_state.search_query = query
+                st.session_state.search_filters = {
+                    "current_company": current_company or None,
+                    "past_companies": past_companies,
+                    "location": location or None,
+                    "school": school or None,
+                }
                 st.session_state.is_loading = True
                 st.session_state.stage = "loading_search"
                 st.rerun()
@@ -200,7 +243,7 @@ if st.session_state.stage == "search":
 elif st.session_state.stage == "loading_search":
     with st.spinner("🔍 Finding your fellow Golden Bears..."):
         try:
-            st.session_state.search_results = backend_search(st.session_state.search_query)
+            show_results(*api.search(st.session_state.search_query, filters=st.session_state.search_filters))
             st.session_state.is_loading = False
             st.session_state.stage = "results"
             st.rerun()
@@ -216,6 +259,10 @@ elif st.session_state.stage == "results":
         if st.button("🔄 New Search", use_container_width=True):
             #clear all relevant state
             st.session_state.search_results = []
+            st.session_state.next_cursor = None
+            st.session_state.similar_to = None
+            st.session_state.results_page = 0
+            st.session_state.picked = {}
             st.session_state.selected_profile = None
             st.session_state.compose_info = ""
             st.session_state.uploaded_file = None
@@ -225,33 +272,62 @@ elif st.session_state.stage == "results":
             st.session_state.stage = "search"
             st.rerun()
 
-    st.markdown("### Found Bears")
-    if not st.session_state.search_results:
-        st.info("No matching profiles found. Try different keywords or broaden your search.")
+    if st.session_state.similar_to:
+        st.markdown(f"### Bears like {st.session_state.similar_to}")
     else:
-        st.markdown(f"Found {len(st.session_state.search_results)} fellow Golden Bears matching your search")
-        for idx, prof in enumerate(st.session_state.search_results):
-            bio_text = prof['bio']
-            parts = bio_text.split("\\n\\n")
-            display_bio_parts = parts[1:] if len(parts) > 1 else []
-            clean_bio = "\n\n".join(display_bio_parts)
-            
-            st.markdown(
-                f"""
-                <div class="profile-card">
-                    <h3><a href="{prof.get('url', '#')}" target="_blank" style="text-decoration:none; color:inherit;">{prof['name']}</a></h3>
-                    <em>{prof['title']}</em>
-                    <p>{clean_bio}</p>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+        st.markdown("### Found Bears")
+
+    # A fragment: ticking a box or turning a page reruns only this list, not the whole app
+    @st.fragment
+    def results_list():
+        results = st.session_state.search_results
+        if not results:
+            st.info("No matching profiles found. Try different keywords or broaden your search.")
+            return
+        more = " so far" if st.session_state.next_cursor else ""
+        st.markdown(f"Found {len(results)} fellow Golden Bears matching your search{more}")
+
+        page = st.session_state.results_page
+        start = page * PAGE_SIZE
+        for idx, prof in enumerate(results[start:start + PAGE_SIZE], start):
+            st.markdown(card_html(prof["name"], prof["title"], prof["bio"], prof.get("url", "#")),
+                        unsafe_allow_html=True)
             first_name = prof["name"].split()[0]
 
             if st.button(f"🤝 Reach out to {first_name}", key=f"reach_{idx}", use_container_width=True):
                 st.session_state.selected_profile = prof
+                st.session_state.batch_profiles = []
                 st.session_state.stage = "confirm"
                 st.rerun()
+            st.checkbox(f"Add {first_name} to a group message", key=f"pick_{pick_key(prof)}",
+                        value=pick_key(prof) in st.session_state.picked, on_change=toggle_pick, args=(prof,))
+            if prof.get("profile_id") and st.button(f"🔎 More like {first_name}", key=f"similar_{idx}",
+                                                    use_container_width=True):
+                try:
+                    show_results(api.similar(prof["profile_id"]), similar_to=prof["name"])
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Couldn't load similar profiles: {str(e)}")
+
+        picked = list(st.session_state.picked.values())
+        if picked and st.button(f"✉️ Write to {len(picked)} selected Bears", use_container_width=True):
+            st.session_state.batch_profiles = picked
+            st.session_state.selected_profile = None
+            st.session_state.stage = "compose"
+            st.rerun()
+
+        prev_col, label_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if page > 0:
+                st.button("⬅️ Previous", on_click=turn_page, args=(-1,), use_container_width=True)
+        with label_col:
+            pages = -(-len(results) // PAGE_SIZE)
+            st.markdown(f"Page {page + 1} of {pages}{'+' if st.session_state.next_cursor else ''}")
+        with next_col:
+            if start + PAGE_SIZE < len(results) or st.session_state.next_cursor:
+                st.button("Next ➡️", on_click=turn_page, args=(1,), use_container_width=True)
+
+    results_list()
 
 elif st.session_state.stage == "confirm":
     prof = st.session_state.selected_profile
@@ -265,14 +341,22 @@ elif st.session_state.stage == "confirm":
     with col2:
         if st.button("No, find other searches", use_container_width=True):
 
-            st.session_state.search_results = []
+            show_results([])
             st.session_state.selected_profile = None
             st.session_state.stage = "search"
             st.rerun()
+    if st.session_state.search_results and st.button("⬅️ Back to results", use_container_width=True):
+        st.session_state.selected_profile = None
+        st.session_state.stage = "results"
+        st.rerun()
 
 elif st.session_state.stage == "compose":
-    prof = st.session_state.selected_profile
-    st.markdown(f"### Compose message to {prof['name']}")
+    batch = st.session_state.batch_profiles
+    if batch:
+        st.markdown(f"### Compose messages to {len(batch)} Bears")
+        st.markdown(", ".join(p["name"] for p in batch))
+    else:
+        st.markdown(f"### Compose message to {st.session_state.selected_profile['name']}")
     
     st.markdown("#### Additional Context")
     st.markdown("Tell us why you want to reach out (such as any shared interests, career advice, networking)")
@@ -288,39 +372,94 @@ elif st.session_state.stage == "compose":
     st.markdown("Upload any relevant documents to help generate a more personalized message")
     uploaded_file = st.file_uploader(
         "Choose a file",
-        type=["pdf", "txt", "doc", "docx"],
+        type=["pdf", "txt", "docx"],
         key="uploaded_file",
         help="Upload any relevant documents (PDF, TXT, DOCX)"
     )
     if uploaded_file is not None:
         st.success(f"✅ Uploaded: {uploaded_file.name}")
 
-    if st.button("Generate Message", use_container_width=True):
-        st.session_state.stage = "loading_email"
+    if st.button("Generate Messages" if batch else "Generate Message", use_container_width=True):
+        st.session_state.stage = "loading_batch" if batch else "loading_email"
+        st.rerun()
+
+    if st.session_state.search_results and st.button("⬅️ Back to results", key="back_to_results",
+                                                     use_container_width=True):
+        st.session_state.stage = "results"
         st.rerun()
 
     if st.button("⬅️ Back to Search", key="back_to_search", use_container_width=True):
         for k in ["stage","search_results","selected_profile",
                   "compose_info","uploaded_file","email_generated",
-                  "is_loading","search_query"]:
+                  "is_loading","search_query","next_cursor","search_filters",
+                  "similar_to","results_page","picked","batch_profiles","batch_emails"]:
             st.session_state.pop(k, None)
         st.session_state.stage = "search"
         st.rerun()
 
 elif st.session_state.stage == "loading_email":
-    with st.spinner("✍️ Writing your personalized message..."):
-        try:
-            st.session_state.email_generated = backend_generate_email(
-                st.session_state.selected_profile,
-                st.session_state.compose_info,
-                st.session_state.uploaded_file
-            )
-            st.session_state.stage = "done"
+    st.markdown("### ✍️ Writing your personalized message...")
+    try:
+        st.session_state.email_generated = st.write_stream(api.generate_email(
+            st.session_state.selected_profile,
+            st.session_state.compose_info,
+            st.session_state.uploaded_file
+        ))
+        st.session_state.stage = "done"
+        st.rerun()
+    except Exception as e:
+        st.error(f"Error generating message: {str(e)}")
+        st.session_state.stage = "compose"
+        st.rerun()
+
+elif st.session_state.stage == "loading_batch":
+    batch = st.session_state.batch_profiles
+    st.markdown(f"### ✍️ Writing {len(batch)} personalized messages...")
+    progress = st.progress(0.0)
+    emails = []
+    try:
+        for msg in api.generate_batch(batch, st.session_state.compose_info, st.session_state.uploaded_file):
+            emails.append(msg)
+            progress.progress(len(emails) / len(batch))
+            with st.expander(batch[msg["index"]]["name"], expanded=True):
+                st.write(msg.get("email") or msg["error"])
+        st.session_state.batch_emails = sorted(emails, key=lambda m: m["index"])
+        st.session_state.stage = "batch_done"
+        st.rerun()
+    except Exception as e:
+        st.error(f"Error generating messages: {str(e)}")
+        st.session_state.stage = "compose"
+        st.rerun()
+
+elif st.session_state.stage == "batch_done":
+    st.markdown("### Your Personalized Messages")
+    for msg in st.session_state.batch_emails:
+        prof = st.session_state.batch_profiles[msg["index"]]
+        with st.expander(prof["name"], expanded=True):
+            if "error" in msg:
+                st.error(msg["error"])
+            else:
+                st.text_area("Message preview", value=msg["email"], height=200,
+                             key=f"batch_email_{msg['index']}", label_visibility="hidden")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("🔄 Regenerate", use_container_width=True):
+            st.session_state.stage = "loading_batch"
             st.rerun()
-        except Exception as e:
-            st.error(f"Error generating message: {str(e)}")
+    with col2:
+        if st.button("✏️ Edit Context", use_container_width=True):
             st.session_state.stage = "compose"
             st.rerun()
+    with col3:
+        if st.button("🔍 New Search", use_container_width=True):
+            for k in ["stage","search_results","selected_profile",
+                      "compose_info","uploaded_file","email_generated",
+                      "is_loading","search_query","next_cursor","search_filters",
+                      "similar_to","results_page","picked","batch_profiles","batch_emails"]:
+                st.session_state.pop(k, None)
+            st.session_state.stage = "search"
+            st.rerun()
 
 elif st.session_state.stage == "done":
     st.markdown("### Your Personalized Message")
@@ -347,7 +486,8 @@ elif st.session_state.stage == "done":
             # Clear all state
             for k in ["stage","search_results","selected_profile",
                       "compose_info","uploaded_file","email_generated",
-                      "is_loading","search_query"]:
+                      "is_loading","search_query","next_cursor","search_filters",
+                      "similar_to","results_page","picked","batch_profiles","batch_emails"]:
                 st.session_state.pop(k, None)
             st.session_state.stage = "search"
             st.rerun()
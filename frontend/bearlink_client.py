@@ -0,0 +1,98 @@
+"""Client for the BearLink API, shared by every Streamlit session of this server.
+
+One keep-alive requests.Session (st.cache_resource) carries every call, with connect/read timeouts
+and retries on connection errors and 502/503/504 (message generation: connection errors only). Searches, filter values and similar-profile
+lists are cached with st.cache_data, so reruns, Back and paging over pages already seen don't go
+back to the API. Message generation is never cached: Regenerate is supposed to write a new one.
+"""
+import json
+import os
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API = os.getenv("BEARLINK_API", "http://localhost:8000/api")
+TIMEOUT = (3.05, 30)          # (connect, read) seconds for search and lookups
+GENERATE_TIMEOUT = (3.05, 180)  # message generation streams for a while
+SEARCH_CACHE_TTL = 300
+
+def _adapter(methods):
+    retry = Retry(total=3, read=0, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                  allowed_methods=frozenset(methods), raise_on_status=False)
+    return HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retry)
+
+@st.cache_resource
+def session():
+    s = requests.Session()
+    # Search and similar lookups are read-only, so their POSTs are retried on 502/503/504 too
+    adapter = _adapter({"GET", "POST"})
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    # ...but not message generation: a 504 may come after a paid completion already ran. Connection
+    # errors (nothing was sent) are still retried. The longest matching prefix wins.
+    s.mount(f"{API}/email", _adapter({"GET"}))
+    return s
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _filters():
+    resp = session().get(f"{API}/filters", timeout=TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()
+
+def filters():
+    """Values offered by the search filters; none if the backend isn't ready yet."""
+    # Caught outside the cached call, so a failure is retried on the next rerun rather than cached
+    try:
+        return _filters()
+    except requests.RequestException:
+        return {}
+
+@st.cache_data(ttl=SEARCH_CACHE_TTL, max_entries=500, show_spinner=False)
+def search(query, cursor=None, filters=None):
+    """One page of unique profiles (the backend groups chunks by profile) and the cursor for the next."""
+    resp = session().post(f"{API}/search", json={"query": query, "cursor": cursor, **(filters or {})},
+                          timeout=TIMEOUT)
+    resp.raise_for_status()
+    page = resp.json()
+    return page["results"], page["next_cursor"]
+
+@st.cache_data(ttl=600, max_entries=500, show_spinner=False)
+def similar(profile_id):
+    """Profiles most like this one, from the graph the backend precomputes at ingest."""
+    resp = session().get(f"{API}/profiles/{profile_id}/similar", timeout=TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()["results"]
+
+def _upload(uploaded_file):
+    return {"file": (uploaded_file.name, uploaded_file.getvalue())} if uploaded_file is not None else {}
+
+def generate_email(profile, context, uploaded_file):
+    """Yield the message piece by piece as /api/email/stream produces it."""
+    data = {"profile": json.dumps(profile), "context": context}
+    with session().post(f"{API}/email/stream", data=data, files=_upload(uploaded_file), stream=True,
+                        timeout=GENERATE_TIMEOUT) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            msg = json.loads(line)
+            if "error" in msg:
+                raise RuntimeError(msg["error"])
+            if "delta" in msg:
+                yield msg["delta"]
+
+def generate_batch(profiles, context, uploaded_file):
+    """Yield {"index", "profile_id", "email" | "error"} as /api/email/batch finishes each message."""
+    data = {"profiles": json.dumps(profiles), "context": context}
+    with session().post(f"{API}/email/batch", data=data, files=_upload(uploaded_file), stream=True,
+                        timeout=GENERATE_TIMEOUT) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            msg = json.loads(line)
+            if "index" in msg:
+                yield msg
+            elif "error" in msg:
+                raise RuntimeError(msg["error"])